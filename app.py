@@ -1,10 +1,10 @@
 import streamlit as st
-from code_agent.manim_agent import ManimAgent
-from code_agent.config import Config
-import tempfile
+from code_agent.config import RenderSettings
+from code_agent.exceptions import QueueFull
+from code_agent.jobs import FAILED, JobQueue
+from code_agent.media_server import MediaServer, get_media_server
 import os
-import shutil
-from pathlib import Path
+import time
 
 st.set_page_config(
     page_title="Math Concept Animator",
@@ -12,39 +12,63 @@ st.set_page_config(
     layout="wide"
 )
 
-def get_latest_video() -> str:
-    """Get the path of the latest generated video."""
-    video_dir = Path("media/videos/720p30")  # Manim's default output directory
-    if not video_dir.exists():
-        return None
-        
-    video_files = list(video_dir.glob("*.mp4"))
-    if not video_files:
-        return None
-        
-    return str(max(video_files, key=os.path.getctime))
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Process-wide queue shared by every session."""
+    return JobQueue()
+
+@st.cache_resource
+def get_video_server() -> MediaServer:
+    """Streams rendered videos from disk, so they never pass through this process."""
+    return get_media_server()
+
+def video_url(video_path: str) -> str:
+    """URL of a rendered video."""
+    if video_path and os.path.exists(video_path):
+        return get_video_server().url_for(video_path)
+    return None
 
-def create_animation(prompt: str) -> tuple[str, str]:
-    """Create animation and return the video path and implementation code."""
-    agent = ManimAgent()
+def show_job(job) -> None:
+    """Show progress of a running job or the result of a finished one."""
+    if not job.is_finished:
+        st.info(f"Generating animation... ({job.progress})")
+        time.sleep(1)
+        st.rerun()
     
-    with st.spinner('Generating animation... This might take a minute...'):
-        try:
-            result = agent.solve(prompt)
-            video_path = get_latest_video()
-            
-            if video_path and os.path.exists(video_path):
-                # Read the video file as bytes
-                with open(video_path, 'rb') as f:
-                    video_bytes = f.read()
-                return video_bytes, result["implementation"]
-            else:
-                st.error("Video file not found after generation")
-                return None, result["implementation"]
-            
-        except Exception as e:
-            st.error(f"Failed to create animation: {str(e)}")
-            return None, None
+    if job.status == FAILED:
+        st.error(f"Failed to create animation: {job.error}")
+        return
+    
+    # Swap in the full-quality render once it has finished
+    upgrade = job.upgrade
+    video_path = job.result["video_path"]
+    upgrading = upgrade is not None and not upgrade.done
+    if upgrade is not None and upgrade.video_path:
+        video_path = upgrade.video_path
+    
+    url = video_url(video_path)
+    implementation = job.result["implementation"]
+    if url:
+        # The browser fetches the video (with range requests) from the media server
+        st.success("Animation created successfully!")
+        if upgrading:
+            st.caption(f"Showing a quick preview while the {upgrade.quality.replace('_', ' ')} version renders...")
+        elif upgrade is not None and upgrade.error:
+            st.caption(f"Showing the preview: the full-quality render failed ({upgrade.error})")
+        st.video(url)
+        
+        # Add download button
+        st.link_button("Download Animation", f"{url}?download=1")
+    else:
+        st.error("Video file not found after generation")
+    
+    # Show the implementation code
+    with st.expander("View Generated Code"):
+        st.code(implementation, language="python")
+    
+    if upgrading:
+        time.sleep(2)
+        st.rerun()
 
 def main():
     st.title("🎬 Math Concept Animator")
@@ -80,31 +104,28 @@ def main():
         index=1
     )
     
-    Config.MANIM_QUALITY = quality
-
     if st.button("Generate Animation", type="primary"):
         if not prompt:
             st.warning("Please enter a prompt first!")
             return
-            
-        video_bytes, implementation = create_animation(prompt)
         
-        if video_bytes:
-            # Display the animation using st.video with bytes
-            st.success("Animation created successfully!")
-            st.video(video_bytes)
-            
-            # Add download button
-            st.download_button(
-                label="Download Animation",
-                data=video_bytes,
-                file_name="math_animation.mp4",
-                mime="video/mp4"
-            )
-            
-            # Show the implementation code
-            with st.expander("View Generated Code"):
-                st.code(implementation, language="python")
+        try:
+            # A new request replaces the previous one, so stop its upgrade render
+            previous = get_job_queue().get(st.session_state.job_id) if st.session_state.get("job_id") else None
+            if previous is not None:
+                get_job_queue().cancel(previous.id)
+            # Cached responses would replay a failed solve exactly, so a retry samples afresh
+            retry = previous is not None and previous.status == FAILED and previous.prompt == prompt
+            job = get_job_queue().submit(prompt, RenderSettings(quality=quality, preview=False, progressive=True),
+                                         use_cache=False if retry else None)
+            st.session_state.job_id = job.id
+        except QueueFull:
+            st.error("The server is busy right now. Please try again in a minute.")
+    
+    job_id = st.session_state.get("job_id")
+    job = get_job_queue().get(job_id) if job_id else None
+    if job is not None:
+        show_job(job)
 
     st.markdown("""
     ### Tips for better results:
@@ -0,0 +1,92 @@
+"""Startup cost of the agent modules and memory per agent instance.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --module app --agents 50
+
+Import times come from ``python -X importtime`` in a fresh interpreter,
+so run it on two checkouts to compare.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["code_agent.manim_agent", "code_agent.jobs", "code_agent.batch"]
+
+# Runs in a fresh interpreter: builds agents with a dummy client and reports
+# the Python heap growth per instance, skipping the first agent, which starts
+# the shared test worker pool.
+AGENT_MEMORY_SCRIPT = """
+import json, sys, tracemalloc
+from types import SimpleNamespace
+from code_agent.manim_agent import ManimAgent
+count = int(sys.argv[1])
+client = SimpleNamespace(messages=None)
+agents = [ManimAgent(client=client, use_cache=False)]
+tracemalloc.start()
+before = tracemalloc.get_traced_memory()[0]
+agents += [ManimAgent(client=client, use_cache=False) for _ in range(count)]
+after = tracemalloc.get_traced_memory()[0]
+print(json.dumps({"agents": count, "kib_per_agent": round((after - before) / count / 1024, 1),
+                  "manim_imported": "manim" in sys.modules}))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PACKAGE_ROOT, env.get("PYTHONPATH")]))
+    return env
+
+
+def import_time(module: str, repeat: int) -> Dict[str, Any]:
+    """Best-of-``repeat`` cumulative import time of ``module`` in microseconds."""
+    best = None
+    imported: List[str] = []
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                 capture_output=True, text=True, env=_env(), cwd=PACKAGE_ROOT)
+        if process.returncode != 0:
+            return {"module": module, "error": process.stderr.strip().splitlines()[-1]}
+        # Lines look like "import time:   self [us] | cumulative | name"
+        rows = [line.split("|") for line in process.stderr.splitlines()
+                if line.startswith("import time:") and "cumulative" not in line]
+        imported = [row[2].strip() for row in rows]
+        total = sum(int(row[1]) for row in rows if not row[2][1:].startswith(" "))
+        best = total if best is None else min(best, total)
+    return {
+        "module": module,
+        "import_ms": round(best / 1000, 1),
+        "modules_imported": len(imported),
+        "manim_imported": "manim" in imported,
+    }
+
+
+def agent_memory(count: int) -> Dict[str, Any]:
+    process = subprocess.run([sys.executable, "-c", AGENT_MEMORY_SCRIPT, str(count)],
+                             capture_output=True, text=True, env=_env(), cwd=PACKAGE_ROOT)
+    if process.returncode != 0:
+        return {"error": process.stderr.strip().splitlines()[-1]}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure agent import time and per-agent memory")
+    parser.add_argument("--module", action="append", help=f"modules to import (default: {DEFAULT_MODULES})")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--agents", type=int, default=20, help="agents to build for the memory figure (0 to skip)")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {
+        "imports": [import_time(module, args.repeat) for module in args.module or DEFAULT_MODULES],
+    }
+    if args.agents:
+        report["agent_memory"] = agent_memory(args.agents)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
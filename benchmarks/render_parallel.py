@@ -0,0 +1,86 @@
+"""Benchmark parallel sectioned rendering against a serial render.
+
+Renders one scene serially and then with 2..N render workers, checks that
+every parallel output has the same frames as the serial one (ffmpeg
+framemd5) and prints the timings as JSON.
+
+    python benchmarks/render_parallel.py manim_sandbox.py ChainRuleDemoDirect --quality production_quality
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_agent import parallel_render  # noqa: E402
+
+
+def frame_hashes(path: str) -> list:
+    output = subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-i", path, "-map", "0:v", "-f", "framemd5", "-"],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return [line.rsplit(",", 1)[-1].strip() for line in output.splitlines() if not line.startswith("#")]
+
+
+def render_serial(module_path: str, scene: str, settings: dict, workdir: str) -> str:
+    serial_settings = dict(settings, media_dir=os.path.join(workdir, "serial"), preview=False)
+    return parallel_render.render_in_subprocess(module_path, scene, serial_settings)["video_path"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("module_path")
+    parser.add_argument("scene")
+    parser.add_argument("--quality", default="medium_quality")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    settings = {"quality": args.quality, "format": "mp4", "disable_caching": True}
+    module_path = os.path.abspath(args.module_path)
+    workdir = tempfile.mkdtemp(prefix="render_bench_")
+    try:
+        start = time.monotonic()
+        serial_path = render_serial(module_path, args.scene, settings, workdir)
+        serial_time = time.monotonic() - start
+        serial_frames = frame_hashes(serial_path)
+        num_animations = parallel_render.count_animations(module_path, args.scene, workdir)
+
+        runs = []
+        for workers in range(2, args.max_workers + 1):
+            output_path = os.path.join(workdir, f"parallel_{workers}.mp4")
+            start = time.monotonic()
+            rendered = parallel_render.render_parallel(module_path, args.scene, settings, output_path,
+                                                       workers=workers, num_animations=num_animations)
+            elapsed = time.monotonic() - start
+            if rendered is None:
+                runs.append({"workers": workers, "skipped": True})
+                continue
+            frames = frame_hashes(rendered)
+            runs.append({
+                "workers": workers,
+                "seconds": round(elapsed, 3),
+                "speedup": round(serial_time / elapsed, 2),
+                "frames": len(frames),
+                "frames_match": frames == serial_frames,
+            })
+
+        print(json.dumps({
+            "scene": args.scene,
+            "quality": args.quality,
+            "animations": num_animations,
+            "cores": os.cpu_count(),
+            "serial": {"seconds": round(serial_time, 3), "frames": len(serial_frames)},
+            "parallel": runs,
+        }, indent=2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Record real LLM responses once and replay them offline.
+
+Responses are keyed on a hash of the request, so a replayed solve makes
+exactly the calls it made while recording. Identical requests (parallel
+candidates) are answered in recorded order. Each response also keeps how
+long the live call took, so a replay can reproduce the timing of the LLM
+calls on the critical path.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_agent.llm_cache import make_key  # noqa: E402
+
+
+class MissingRecording(KeyError):
+    """Raised when a replayed request was never recorded"""
+
+
+def _usage(usage: Any) -> Dict[str, int]:
+    if usage is None:
+        return {}
+    fields = ("input_tokens", "output_tokens", "prompt_tokens", "completion_tokens",
+              "cache_read_input_tokens", "cache_creation_input_tokens")
+    return {name: getattr(usage, name) for name in fields if isinstance(getattr(usage, name, None), int)}
+
+
+class Recording:
+    """Recorded responses for one benchmark prompt, stored as a JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: List[Dict[str, Any]] = []
+        self._queues: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+            for entry in self.entries:
+                self._queues[entry["key"]].append(entry)
+
+    def add(self, request: Dict[str, Any], text: str, usage: Dict[str, int], seconds: float = 0.0) -> None:
+        with self._lock:
+            self.entries.append({"key": make_key(request), "text": text, "usage": usage,
+                                 "seconds": round(seconds, 3)})
+
+    def next(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        key = make_key(request)
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                raise MissingRecording(f"No recorded response for request {key[:12]}")
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+        return entry
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.entries, f, indent=1)
+
+
+def _message(text: str, usage: Dict[str, int]) -> SimpleNamespace:
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=text)],
+        usage=SimpleNamespace(**usage),
+    )
+
+
+def _completion(text: str, usage: Dict[str, int]) -> SimpleNamespace:
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(**usage),
+    )
+
+
+class _ReplayStream:
+    """Stand-in for ``client.messages.stream(...)``.
+
+    With ``latency`` the recorded duration is spread over the chunks, so
+    stopping a stream early saves time as it would live.
+    """
+
+    def __init__(self, entry: Dict[str, Any], chunk_size: int = 16, latency: bool = False):
+        self._entry = entry
+        self._chunk_size = chunk_size
+        self._latency = latency
+
+    def __enter__(self) -> "_ReplayStream":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    @property
+    def text_stream(self) -> Iterator[str]:
+        text = self._entry["text"]
+        delay = 0.0
+        if self._latency and text:
+            delay = self._entry.get("seconds", 0.0) * self._chunk_size / len(text)
+        for i in range(0, len(text), self._chunk_size):
+            time.sleep(delay)
+            yield text[i:i + self._chunk_size]
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        usage = self._entry["usage"]
+        yield SimpleNamespace(type="message_start", message=SimpleNamespace(
+            usage=SimpleNamespace(**{k: v for k, v in usage.items() if k != "output_tokens"})))
+        for text in self.text_stream:
+            yield SimpleNamespace(type="content_block_delta",
+                                  delta=SimpleNamespace(type="text_delta", text=text))
+        yield SimpleNamespace(type="message_delta",
+                              usage=SimpleNamespace(output_tokens=usage.get("output_tokens", 0)))
+
+    def get_final_message(self) -> SimpleNamespace:
+        return _message(self._entry["text"], self._entry["usage"])
+
+
+def _wait(entry: Dict[str, Any], latency: bool) -> Dict[str, Any]:
+    if latency:
+        time.sleep(entry.get("seconds", 0.0))
+    return entry
+
+
+class _ReplayMessages:
+    def __init__(self, recording: Recording, latency: bool):
+        self._recording = recording
+        self._latency = latency
+
+    def create(self, **request: Any) -> SimpleNamespace:
+        entry = _wait(self._recording.next(request), self._latency)
+        return _message(entry["text"], entry["usage"])
+
+    def stream(self, **request: Any) -> _ReplayStream:
+        return _ReplayStream(self._recording.next(request), latency=self._latency)
+
+
+class _ReplayCompletions:
+    def __init__(self, recording: Recording, latency: bool):
+        self._recording = recording
+        self._latency = latency
+
+    def create(self, **request: Any) -> SimpleNamespace:
+        entry = _wait(self._recording.next(request), self._latency)
+        return _completion(entry["text"], entry["usage"])
+
+
+class ReplayClient:
+    """Offline client serving recorded Anthropic and OpenAI responses.
+
+    With ``latency`` every response takes as long as it did when recorded.
+    """
+
+    def __init__(self, recording: Recording, latency: bool = False):
+        self.messages = _ReplayMessages(recording, latency)
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(recording, latency))
+
+
+class _RecordingMessages:
+    def __init__(self, inner: Any, recording: Recording):
+        self._inner = inner
+        self._recording = recording
+
+    def create(self, **request: Any) -> Any:
+        start = time.perf_counter()
+        response = self._inner.create(**request)
+        self._recording.add(request, response.content[0].text, _usage(response.usage),
+                            time.perf_counter() - start)
+        return response
+
+    def stream(self, **request: Any) -> _ReplayStream:
+        # Record the whole response so any streamed prefix can be replayed
+        response = self.create(**request)
+        return _ReplayStream({"text": response.content[0].text, "usage": _usage(response.usage)})
+
+
+class _RecordingCompletions:
+    def __init__(self, inner: Any, recording: Recording):
+        self._inner = inner
+        self._recording = recording
+
+    def create(self, **request: Any) -> Any:
+        start = time.perf_counter()
+        response = self._inner.create(**request)
+        self._recording.add(request, response.choices[0].message.content, _usage(response.usage),
+                            time.perf_counter() - start)
+        return response
+
+
+class RecordingClient:
+    """Wraps a live Anthropic or OpenAI client and records every response."""
+
+    def __init__(self, inner: Any, recording: Recording):
+        if hasattr(inner, "messages"):
+            self.messages = _RecordingMessages(inner.messages, recording)
+        if hasattr(inner, "chat"):
+            self.chat = SimpleNamespace(completions=_RecordingCompletions(inner.chat.completions, recording))
+
+
+def recording_path(directory: str, prompt_id: str) -> str:
+    return os.path.join(directory, f"{prompt_id}.json")
+
+
+def load_corpus(path: Optional[str] = None) -> List[Dict[str, str]]:
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus.json")
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,244 @@
+"""End-to-end solve latency benchmark with recorded LLM responses.
+
+Record real responses once (needs API keys):
+
+    python benchmarks/solve_latency.py --record
+
+Replay them offline and write per-phase timings as JSON:
+
+    python benchmarks/solve_latency.py --output bench.json
+
+Compare against an earlier run and fail on regressions:
+
+    python benchmarks/solve_latency.py --compare baseline.json
+
+Measure few-shot retrieval by recording and replaying with a fresh example
+library (seeded from manim_sandbox.py and grown by the corpus as it solves)
+into its own recordings directory, then comparing ``mean_iterations``:
+
+    python benchmarks/solve_latency.py --examples --record --recordings recordings-examples
+    python benchmarks/solve_latency.py --examples --recordings recordings-examples
+
+``--latency`` replays every LLM call with its recorded duration, so
+``seconds_per_iteration`` shows the critical path of an iteration,
+including work that overlaps with the model calls.
+
+To compare edit-based repair with full regeneration, record and replay
+once as is and once with PATCH_REPAIR=0 (separate recordings) and
+compare ``output_tokens_by_phase`` and ``seconds_per_iteration``.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.replay import (  # noqa: E402
+    Recording, RecordingClient, ReplayClient, load_corpus, recording_path,
+)
+from code_agent.config import Config, RenderSettings  # noqa: E402
+from code_agent.examples import get_example_library  # noqa: E402
+from code_agent.tracing import USAGE_FIELDS  # noqa: E402
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+
+# Agent method -> phase name in the report
+PHASES = {
+    "generate_test": "test_generation",
+    "generate_implementation": "implementation",
+    "run_tests": "run_tests",
+    "_analyze_test_failure": "failure_analysis",
+    "_render_animation": "render",
+}
+
+
+def instrument(agent: Any) -> Dict[str, List[float]]:
+    """Wrap the agent's phase methods so every call is timed."""
+    timings: Dict[str, List[float]] = defaultdict(list)
+    lock = threading.Lock()
+    for method, phase in PHASES.items():
+        original = getattr(agent, method, None)
+        if original is None:
+            continue
+
+        def timed(*args, _original=original, _phase=phase, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                with lock:
+                    timings[_phase].append(time.perf_counter() - start)
+
+        setattr(agent, method, timed)
+    return timings
+
+
+def token_totals(spans: List[Any]) -> Dict[str, int]:
+    """Token counts summed over the agent's LLM spans."""
+    totals: Dict[str, int] = defaultdict(int)
+    for span in spans:
+        if span.name.startswith("llm."):
+            totals["calls"] += 1
+            totals["cache_hits"] += int(bool(span.attributes.get("cache_hit")))
+            for name in USAGE_FIELDS:
+                totals[name] += span.attributes.get(name, 0)
+    return {name: value for name, value in sorted(totals.items()) if value or name == "calls"}
+
+
+def output_tokens_by_phase(spans: List[Any]) -> Dict[str, int]:
+    """Output tokens per LLM phase, e.g. implementation vs repair."""
+    totals: Dict[str, int] = defaultdict(int)
+    for span in spans:
+        if span.name.startswith("llm."):
+            totals[span.name[len("llm."):]] += span.attributes.get("output_tokens", 0)
+    return dict(sorted(totals.items()))
+
+
+def repair_stats(spans: List[Any]) -> Dict[str, int]:
+    """How many repair attempts were applied as edits and how many fell back."""
+    repairs = [span for span in spans if span.name == "repair"]
+    applied = sum(1 for span in repairs if span.attributes.get("applied"))
+    return {"applied": applied, "fallbacks": len(repairs) - applied}
+
+
+def make_agent(entry: Dict[str, str], client: Any, args: argparse.Namespace) -> Any:
+    if entry["agent"] == "code":
+        from code_agent.agent import CodeAgent
+        return CodeAgent(client=client, use_cache=False)
+    from code_agent.manim_agent import ManimAgent
+    agent = ManimAgent(client=client, use_cache=False,
+                       settings=RenderSettings(quality=args.quality, preview=False))
+    # Solves replay only when nothing from earlier runs leaks into the prompts
+    agent.test_index = None
+    agent.examples = get_example_library(args.examples_path) if args.examples else None
+    if args.skip_render:
+        agent._render_animation = lambda implementation, scene_class_name: None
+    return agent
+
+
+def live_client(agent: str) -> Any:
+    if agent == "code":
+        import openai
+        return openai.OpenAI(api_key=Config.OPENAI_API_KEY)
+    from anthropic import Anthropic
+    return Anthropic(api_key=Config.ANTHROPIC_API_KEY)
+
+
+def run_entry(entry: Dict[str, str], args: argparse.Namespace) -> Dict[str, Any]:
+    recording = Recording(recording_path(args.recordings, entry["id"]))
+    if args.record:
+        recording.entries = []
+        client = RecordingClient(live_client(entry["agent"]), recording)
+    elif not recording.entries:
+        return {"id": entry["id"], "agent": entry["agent"], "status": "no_recording"}
+    else:
+        client = ReplayClient(recording, latency=args.latency)
+
+    agent = make_agent(entry, client, args)
+    timings = instrument(agent)
+    start = time.perf_counter()
+    report: Dict[str, Any] = {"id": entry["id"], "agent": entry["agent"]}
+    try:
+        # Keep the agent's progress output off stdout, which carries the report
+        with contextlib.redirect_stdout(sys.stderr):
+            result = agent.solve(entry["prompt"])
+        report["status"] = "passed"
+        report["iterations"] = result["iterations"]
+        report["seconds_per_iteration"] = round((time.perf_counter() - start) / result["iterations"], 3)
+    except Exception as e:
+        report["status"] = "failed"
+        report["error"] = f"{type(e).__name__}: {e}"
+    report["wall_seconds"] = round(time.perf_counter() - start, 3)
+    report["phases"] = {
+        phase: {"calls": len(values), "total": round(sum(values), 3),
+                "each": [round(v, 3) for v in values]}
+        for phase, values in sorted(timings.items())
+    }
+    # Spans survive a failed solve, unlike the result they are attached to
+    report["tokens"] = token_totals(agent.tracer.spans)
+    report["output_tokens_by_phase"] = output_tokens_by_phase(agent.tracer.spans)
+    report["repairs"] = repair_stats(agent.tracer.spans)
+    if args.record:
+        recording.save()
+    return report
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Per-prompt wall time and phase totals that got slower than ``threshold``."""
+    regressions = []
+    previous = {r["id"]: r for r in baseline["results"]}
+    for result in current["results"]:
+        before = previous.get(result["id"])
+        if not before or "wall_seconds" not in result or "wall_seconds" not in before:
+            continue
+        pairs = [("wall", result["wall_seconds"], before["wall_seconds"])]
+        for phase, stats in result["phases"].items():
+            if phase in before["phases"]:
+                pairs.append((phase, stats["total"], before["phases"][phase]["total"]))
+        for name, now, then in pairs:
+            if then > 0 and (now - then) / then > threshold:
+                regressions.append(f"{result['id']} {name}: {then:.3f}s -> {now:.3f}s")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end solve latency")
+    parser.add_argument("--record", action="store_true", help="call the live APIs and record responses")
+    parser.add_argument("--recordings", default=RECORDINGS_DIR)
+    parser.add_argument("--corpus", default=None, help="corpus JSON (default: benchmarks/corpus.json)")
+    parser.add_argument("--only", action="append", help="run only these prompt ids")
+    parser.add_argument("--quality", default="low_quality")
+    parser.add_argument("--skip-render", action="store_true")
+    parser.add_argument("--examples", action="store_true",
+                        help="give the manim agent a fresh few-shot example library")
+    parser.add_argument("--latency", action="store_true",
+                        help="replay each response after its recorded duration")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown ratio")
+    args = parser.parse_args()
+
+    # A new library per run, so replays see the same examples as the recording
+    args.examples_path = os.path.join(tempfile.mkdtemp(), "examples.sqlite3")
+    corpus = [e for e in load_corpus(args.corpus) if not args.only or e["id"] in args.only]
+    results = [run_entry(entry, args) for entry in corpus]
+    totals: Dict[str, float] = defaultdict(float)
+    for result in results:
+        for phase, stats in result.get("phases", {}).items():
+            totals[phase] += stats["total"]
+    report = {
+        "mode": "record" if args.record else "replay",
+        "results": results,
+        "totals": {phase: round(total, 3) for phase, total in sorted(totals.items())},
+        "examples": args.examples,
+    }
+    iterations = [r["iterations"] for r in results if "iterations" in r]
+    if iterations:
+        report["mean_iterations"] = round(sum(iterations) / len(iterations), 2)
+        per_iteration = [r["seconds_per_iteration"] for r in results if "seconds_per_iteration" in r]
+        report["mean_seconds_per_iteration"] = round(sum(per_iteration) / len(per_iteration), 3)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .config import Config
+from .exceptions import RenderCancelled
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Process-wide pool for background renders, UPGRADE_WORKERS wide.
+
+    Each render may start RENDER_WORKERS manim processes, so a burst of
+    progressive jobs queues here instead of forking without bound.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.UPGRADE_WORKERS,
+                                           thread_name_prefix="background-render")
+        return _executor
+
+
+class BackgroundRender:
+    """A render queued on the shared background pool that callers poll or cancel.
+
+    ``render`` receives a cancel event and returns the video path; it is
+    expected to raise RenderCancelled once the event is set. A render
+    cancelled while still queued never starts.
+    """
+
+    def __init__(self, render: Callable[[threading.Event], str], quality: str):
+        self.quality = quality
+        self.video_path: Optional[str] = None
+        self.error: Optional[str] = None
+        self._render = render
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        _get_executor().submit(self._run)
+
+    def _run(self) -> None:
+        try:
+            if not self._cancel.is_set():
+                self.video_path = self._render(self._cancel)
+        except RenderCancelled:
+            pass
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        """Stop the render; a finished render is left alone."""
+        if not self.done:
+            self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Block until the render finishes and return its video path."""
+        self._done.wait(timeout)
+        return self.video_path
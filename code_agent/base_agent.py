@@ -0,0 +1,346 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .config import Config
+from .engine import get_engine
+from .exceptions import DeadlineExceeded, MaxIterationsReached, StreamAborted, TestGenerationError
+from .history import AttemptHistory
+from .llm_cache import get_cache, make_key
+from .providers import LLMRequest, Provider
+from .test_result import TestResult
+from .tracing import Tracer, add_usage
+
+
+def _split_cached_tokens(span: Dict) -> None:
+    """Summarize a call's input tokens as served from the prompt cache or not."""
+    if "input_tokens" in span:
+        span["cached_input_tokens"] = span.get("cache_read_input_tokens", 0)
+        span["uncached_input_tokens"] = span["input_tokens"] + span.get("cache_creation_input_tokens", 0)
+
+
+def _discard(future: "asyncio.Future") -> None:
+    """Mark the outcome of an abandoned future as seen, so asyncio does not warn about it."""
+    if not future.cancelled():
+        future.exception()
+
+
+class BaseAgent:
+    """The test-driven solve loop shared by every agent.
+
+    A solve runs as a coroutine on the process-wide engine: generate tests,
+    then generate and test candidates until one passes, the candidate
+    budget is spent or the deadline passes. Subclasses supply the domain
+    steps (``generate_test``, ``generate_implementation``, ``_run_tests``)
+    as blocking methods, which the engine runs on its step threads; their
+    LLM calls go through ``_create_message`` and the agent's provider.
+    """
+
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    # Whether generate_implementation(prompt, "") may run before the tests exist
+    supports_speculation = False
+
+    def __init__(self, provider: Provider, model: Optional[str] = None,
+                 use_cache: Optional[bool] = None,
+                 progress: Optional[Callable[[str], None]] = None):
+        self.provider = provider
+        self.model = model or provider.default_model
+        self.max_iterations = Config.MAX_ITERATIONS
+        self.history = AttemptHistory()
+        self.current_iteration = 0
+        self.progress = progress
+        use_cache = Config.LLM_CACHE_ENABLED if use_cache is None else use_cache
+        self.llm_cache = get_cache() if use_cache else None
+        self._failure_analysis = ""  # from a separate analysis call, when not folded
+        self.tracer = Tracer()
+        self.engine = get_engine()
+
+    def _report_progress(self, state: str) -> None:
+        if self.progress is not None:
+            self.progress(state)
+
+    @property
+    def attempt_history(self) -> List[str]:
+        return self.history.attempts
+
+    @property
+    def test_results_history(self) -> List[TestResult]:
+        return self.history.results
+
+    def _build_implementation_context(self) -> str:
+        """Build context from previous implementation attempts."""
+        return self.history.build_context()
+
+    @staticmethod
+    def _extract_code(text: str) -> str:
+        if "```python" in text:
+            text = text.split("```python")[1].split("```")[0]
+        elif "```" in text:
+            text = text.split("```")[1]
+        return text.strip()
+
+    def _create_message(self, system: str, content: str, sample: int = 0,
+                        stream_code: bool = False, phase: str = "message",
+                        cached_prefix: Optional[str] = None) -> str:
+        """Send one request to the model, going through the response cache.
+
+        With ``stream_code`` (and a provider that streams) the response is
+        streamed, reading stops at the end of the first code block and
+        responses with broken code are abandoned early and retried, then
+        requested without streaming once the retries are used up. Each
+        call is traced as ``llm.<phase>``.
+
+        ``cached_prefix`` is sent ahead of ``content``; providers that
+        support it mark it and the system prompt for prompt caching.
+        """
+        request = LLMRequest(self.model, system, content, cached_prefix,
+                             max_tokens=self.max_tokens, temperature=self.temperature)
+        with self.tracer.span(f"llm.{phase}", model=self.model, provider=self.provider.name,
+                              sample=sample, cache_hit=False) as span:
+            key = None
+            if self.llm_cache is not None:
+                key = make_key(self.provider.native(request), sample)
+                cached = self.llm_cache.get(key)
+                if cached is not None:
+                    span["cache_hit"] = True
+                    return cached
+
+            text = None
+            if stream_code and Config.LLM_STREAMING and self.provider.supports_streaming:
+                span["streamed"] = True
+                for attempt in range(Config.STREAM_RETRIES + 1):
+                    usage = {}
+                    try:
+                        text = self.engine.run(self.provider.stream_code(request, usage))
+                        break
+                    except StreamAborted as e:
+                        print(f"\n{e} (attempt {attempt + 1}/{Config.STREAM_RETRIES + 1})")
+                        span["aborted_streams"] = span.get("aborted_streams", 0) + 1
+                    finally:
+                        add_usage(span, usage)
+            if text is None:
+                # Not streamed, or every stream was aborted: a plain request
+                # returns the whole response, never a cut-off prefix
+                response = self.engine.run(self.provider.complete(request))
+                text = response.text
+                add_usage(span, response.usage)
+
+            _split_cached_tokens(span)
+            if key is not None:
+                self.llm_cache.put(key, text)
+            return text
+
+    def generate_test(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def generate_implementation(self, prompt: str, test_code: str, sample: int = 0) -> str:
+        raise NotImplementedError
+
+    def _run_tests(self, test_code: str, implementation_code: str) -> TestResult:
+        raise NotImplementedError
+
+    def _find_tests(self, prompt: str) -> Optional[str]:
+        """Tests to reuse instead of generating them, if any."""
+        return None
+
+    def _analyze_test_failure(self, test_result: TestResult) -> str:
+        """Explanation of a failure, used when FOLD_FAILURE_ANALYSIS is off."""
+        return ""
+
+    def _on_pass(self, prompt: str, test_code: str, implementation: str,
+                 tests_reused: bool, candidates_used: int) -> Dict[str, Any]:
+        """The solve result once ``implementation`` passes."""
+        return {
+            "test_code": test_code,
+            "implementation": implementation,
+            "iterations": self.current_iteration + 1,
+            "candidates": candidates_used,
+            "tests_reused": tests_reused,
+            "context_tokens": self.history.context_sizes,
+        }
+
+    def run_tests(self, test_code: str, implementation_code: str) -> TestResult:
+        with self.tracer.span("tests") as span:
+            result = self._run_tests(test_code, implementation_code)
+            span.update(
+                passed=result.passed,
+                failed_tests=result.failed_tests,
+                collection_time=result.collection_time,
+                execution_time=result.execution_time,
+                skipped_executions=result.skipped_executions,
+                test_durations=result.test_durations,
+                limit_violation=result.limit_violation,
+            )
+        return result
+
+    def solve(self, prompt: str, num_candidates: Optional[int] = None,
+              max_candidates: Optional[int] = None,
+              deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Generate tests and an implementation that passes them.
+
+        Each iteration generates ``num_candidates`` implementations concurrently
+        and returns as soon as one of them passes. ``max_candidates`` caps the
+        total number of candidates across the solve and ``deadline`` is a
+        wall-clock limit in seconds. The result carries the solve's timing
+        spans under ``spans``.
+        """
+        return self.engine.run(self._traced_solve(prompt, num_candidates, max_candidates, deadline))
+
+    async def asolve(self, prompt: str, num_candidates: Optional[int] = None,
+                     max_candidates: Optional[int] = None,
+                     deadline: Optional[float] = None) -> Dict[str, Any]:
+        """``solve`` for callers with an event loop of their own."""
+        return await asyncio.wrap_future(
+            self.engine.submit(self._traced_solve(prompt, num_candidates, max_candidates, deadline))
+        )
+
+    async def _traced_solve(self, prompt: str, num_candidates: Optional[int],
+                            max_candidates: Optional[int], deadline: Optional[float]) -> Dict[str, Any]:
+        self.tracer.reset()
+        try:
+            with self.tracer.span("solve", provider=self.provider.name) as span:
+                result = await self._solve(prompt, num_candidates, max_candidates, deadline)
+                span["iterations"] = result["iterations"]
+            result["spans"] = self.tracer.to_list()
+            return result
+        finally:
+            await self.engine.step(self.tracer.export)
+
+    async def _solve(self, prompt: str, num_candidates: Optional[int],
+                     max_candidates: Optional[int], deadline: Optional[float]) -> Dict[str, Any]:
+        num_candidates = max(1, num_candidates or Config.NUM_CANDIDATES)
+        max_candidates = max_candidates or Config.MAX_CANDIDATES or self.max_iterations * num_candidates
+        deadline = deadline if deadline is not None else Config.SOLVE_DEADLINE
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        self._failure_analysis = ""
+
+        test_code = await self.engine.step(self._find_tests, prompt)
+        tests_reused = test_code is not None
+        speculative: Optional[asyncio.Future] = None
+        try:
+            if not tests_reused:
+                if self.supports_speculation and Config.SPECULATIVE_FIRST_ATTEMPT and max_candidates > 0:
+                    # Written while the tests are, and tested once they exist
+                    speculative = asyncio.ensure_future(self.engine.step(self.generate_implementation, prompt, ""))
+                    speculative.add_done_callback(_discard)
+                print(f"Generating tests for prompt: {prompt}")
+                self._report_progress("generating tests")
+                test_code = await self.engine.step(self.generate_test, prompt)
+            print("\nGenerated test code:")
+            print(test_code)
+            return await self._iterate(prompt, test_code, tests_reused, num_candidates, max_candidates,
+                                       deadline, deadline_at, speculative)
+        finally:
+            # A speculative call still running here has been superseded; its
+            # result is never used
+            if speculative is not None:
+                speculative.cancel()
+
+    async def _iterate(self, prompt: str, test_code: str, tests_reused: bool, num_candidates: int,
+                       max_candidates: int, deadline: Optional[float], deadline_at: Optional[float],
+                       speculative: Optional[asyncio.Future]) -> Dict[str, Any]:
+        candidates_used = 0
+
+        while self.current_iteration < self.max_iterations and candidates_used < max_candidates:
+            if deadline_at is not None and time.monotonic() >= deadline_at:
+                raise DeadlineExceeded(f"No passing implementation within {deadline}s deadline")
+
+            print(f"\nIteration {self.current_iteration + 1}/{self.max_iterations}")
+            self._report_progress(f"iteration {self.current_iteration + 1}/{self.max_iterations}")
+            count = min(num_candidates, max_candidates - candidates_used)
+            candidates_used += count
+
+            round_results = await self._run_candidates(prompt, test_code, count, deadline_at, speculative)
+            speculative = None
+
+            # Store attempts and results
+            for implementation, test_result in round_results:
+                print("\nGenerated implementation:")
+                print(implementation)
+                self.history.add(implementation, test_result)
+
+            passing = [impl for impl, result in round_results if result.passed]
+            if passing:
+                print("\nAll tests passed!")
+                return await self.engine.step(self._on_pass, prompt, test_code, passing[0],
+                                              tests_reused, candidates_used)
+            elif round_results:
+                if Config.FOLD_FAILURE_ANALYSIS:
+                    # The next generation request analyzes the failure itself
+                    print("\nTests failed. Generating new implementation...")
+                else:
+                    print("\nTests failed. Analyzing failures...")
+                    self._failure_analysis = await self.engine.step(self._analyze_test_failure,
+                                                                    round_results[-1][1])
+                    print(f"Analysis: {self._failure_analysis}")
+                    print("Generating new implementation...")
+
+            self.current_iteration += 1
+
+        if deadline_at is not None and time.monotonic() >= deadline_at:
+            raise DeadlineExceeded(f"No passing implementation within {deadline}s deadline")
+        raise MaxIterationsReached("Failed to generate passing implementation within max iterations")
+
+    async def _run_candidates(self, prompt: str, test_code: str, count: int,
+                              deadline_at: Optional[float],
+                              speculative: Optional[asyncio.Future] = None) -> List[Tuple[str, TestResult]]:
+        """Generate and test ``count`` candidates concurrently, stopping at the first pass.
+
+        A ``speculative`` implementation already being generated takes the
+        place of one of the candidates.
+        """
+        cancelled = threading.Event()
+        pending: Set[asyncio.Future] = {
+            asyncio.ensure_future(self.engine.step(self._generate_candidate, prompt, test_code, sample, cancelled))
+            for sample in range(count - (speculative is not None))
+        }
+        if speculative is not None:
+            pending.add(asyncio.ensure_future(self._test_speculative(speculative, test_code, cancelled)))
+        results = []
+        errors = []
+        try:
+            while pending:
+                timeout = None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    print("\nDeadline reached, abandoning remaining candidates")
+                    break
+                for future in done:
+                    try:
+                        candidate = future.result()
+                    except TestGenerationError as e:
+                        errors.append(e)
+                        continue
+                    if candidate is not None:
+                        results.append(candidate)
+                        if candidate[1].passed:
+                            return results
+        finally:
+            # Steps already running on a thread cannot be interrupted, but
+            # their results are dropped and they will not go on to run tests.
+            cancelled.set()
+            for future in pending:
+                future.cancel()
+                future.add_done_callback(_discard)
+
+        if not results and errors and len(errors) == count:
+            raise errors[-1]
+        return results
+
+    def _generate_candidate(self, prompt: str, test_code: str, sample: int,
+                            cancelled: threading.Event) -> Optional[Tuple[str, TestResult]]:
+        """Generate one implementation and test it unless the round was cancelled."""
+        implementation = self.generate_implementation(prompt, test_code, sample=sample)
+        if cancelled.is_set():
+            return None
+        return implementation, self.run_tests(test_code, implementation)
+
+    async def _test_speculative(self, speculative: asyncio.Future, test_code: str,
+                                cancelled: threading.Event) -> Optional[Tuple[str, TestResult]]:
+        """Test an implementation written before the tests existed."""
+        implementation = await speculative
+        if cancelled.is_set():
+            return None
+        return implementation, await self.engine.step(self.run_tests, test_code, implementation)
@@ -0,0 +1,258 @@
+"""Solve many prompts concurrently with shared clients and rate limits.
+
+    python -m code_agent.batch prompts.jsonl --output-dir batch_results
+
+Every finished prompt is written to ``<output-dir>/<id>.json`` straight
+away. Running the same batch again skips prompts that already passed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from .config import Config, RenderSettings
+from .history import estimate_tokens
+
+PASSED = "passed"
+FAILED = "failed"
+
+
+class RateLimiter:
+    """Sliding one-minute window over requests and tokens, shared by threads.
+
+    ``acquire`` blocks until a request estimated at ``tokens`` fits in both
+    budgets and returns a handle; ``settle`` replaces the estimate with the
+    real count once the response reports its usage.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None, window: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self._events: deque = deque()  # [timestamp, tokens]
+        self._condition = threading.Condition()
+
+    def _prune(self, now: float) -> None:
+        while self._events and self._events[0][0] <= now - self.window:
+            self._events.popleft()
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        if not self._events:
+            return 0.0  # a request larger than the whole budget still goes through alone
+        over_requests = self.requests_per_minute is not None and len(self._events) >= self.requests_per_minute
+        used = sum(event[1] for event in self._events)
+        over_tokens = self.tokens_per_minute is not None and used + tokens > self.tokens_per_minute
+        if not over_requests and not over_tokens:
+            return 0.0
+        return max(0.01, self._events[0][0] + self.window - now)
+
+    def acquire(self, tokens: int = 0) -> List[float]:
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                delay = self._wait_time(tokens, now)
+                if delay == 0.0:
+                    event = [now, tokens]
+                    self._events.append(event)
+                    return event
+                self._condition.wait(delay)
+
+    def settle(self, event: List[float], tokens: int) -> None:
+        with self._condition:
+            event[1] = tokens
+            self._condition.notify_all()
+
+
+def _request_tokens(request: Dict[str, Any]) -> int:
+    """Upper estimate of a request's tokens: its prompt plus the output cap."""
+    prompt = json.dumps({"system": request.get("system"), "messages": request.get("messages")})
+    return estimate_tokens(prompt) + request.get("max_tokens", 0)
+
+
+class _RateLimitedMessages:
+    def __init__(self, inner: Any, limiter: RateLimiter):
+        self._inner = inner
+        self._limiter = limiter
+
+    def create(self, **request: Any) -> Any:
+        event = self._limiter.acquire(_request_tokens(request))
+        response = self._inner.create(**request)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self._limiter.settle(event, (getattr(usage, "input_tokens", 0) or 0)
+                                 + (getattr(usage, "output_tokens", 0) or 0))
+        return response
+
+    def stream(self, **request: Any) -> Any:
+        # Streams keep their estimate: a response cut short at its code
+        # fence never reports the final usage.
+        self._limiter.acquire(_request_tokens(request))
+        return self._inner.stream(**request)
+
+
+class RateLimitedClient:
+    """Anthropic client wrapper that passes every request through a RateLimiter."""
+
+    def __init__(self, inner: Any, limiter: RateLimiter):
+        self.inner = inner
+        self.messages = _RateLimitedMessages(inner.messages, limiter)
+
+
+def make_client(max_connections: Optional[int] = None, api_key: Optional[str] = None) -> Any:
+    """One Anthropic client with a connection pool sized for the batch."""
+    import httpx
+    from anthropic import Anthropic, DefaultHttpxClient
+
+    max_connections = max_connections or Config.BATCH_CONCURRENCY
+    http_client = DefaultHttpxClient(limits=httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+    ))
+    return Anthropic(api_key=api_key or Config.ANTHROPIC_API_KEY, http_client=http_client)
+
+
+def prompt_id(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode()).hexdigest()[:16]
+
+
+def _normalize_prompts(prompts: Union[Sequence[str], Dict[str, str]]) -> List[Tuple[str, str]]:
+    if isinstance(prompts, dict):
+        return list(prompts.items())
+    return [(prompt_id(prompt), prompt) for prompt in prompts]
+
+
+def result_path(output_dir: str, item_id: str) -> str:
+    return os.path.join(output_dir, f"{item_id}.json")
+
+
+def previous_status(output_dir: str, item_id: str) -> Optional[str]:
+    """Status an earlier run recorded for this prompt, if any."""
+    try:
+        with open(result_path(output_dir, item_id)) as f:
+            return json.load(f).get("status")
+    except (OSError, ValueError):
+        return None
+
+
+def is_complete(output_dir: str, item_id: str) -> bool:
+    """Whether an earlier run already solved this prompt."""
+    return previous_status(output_dir, item_id) == PASSED
+
+
+def _write_result(output_dir: str, record: Dict[str, Any]) -> None:
+    path = result_path(output_dir, record["id"])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(record, f, indent=2, default=str)
+    # Atomic, so an interrupted batch never leaves a half-written result
+    os.replace(tmp_path, path)
+
+
+def solve_many(prompts: Union[Sequence[str], Dict[str, str]], output_dir: str,
+               concurrency: Optional[int] = None,
+               requests_per_minute: Optional[int] = None,
+               tokens_per_minute: Optional[int] = None,
+               settings: Optional[RenderSettings] = None,
+               client: Any = None,
+               agent_factory: Optional[Callable[..., Any]] = None,
+               on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """Solve ``prompts`` concurrently and write each result as it finishes.
+
+    ``prompts`` is a list of prompts or a mapping of id to prompt. Prompts
+    that already passed in ``output_dir`` are skipped, ones that failed are
+    retried without the LLM cache, and a failing prompt is recorded without
+    stopping the others. All agents share one rate
+    limited HTTP client, the LLM and render caches and the test worker pool.
+    Returns the records of the prompts run in this call, in input order.
+    """
+    concurrency = concurrency or Config.BATCH_CONCURRENCY
+    limiter = RateLimiter(requests_per_minute or Config.BATCH_REQUESTS_PER_MINUTE,
+                          tokens_per_minute or Config.BATCH_TOKENS_PER_MINUTE)
+    shared_client = RateLimitedClient(client or make_client(concurrency), limiter)
+    # Nobody is watching a preview window during a batch
+    settings = settings or RenderSettings(preview=False)
+    if agent_factory is None:
+        from .manim_agent import ManimAgent
+        agent_factory = ManimAgent
+    os.makedirs(output_dir, exist_ok=True)
+
+    items = [(item_id, prompt) for item_id, prompt in _normalize_prompts(prompts)
+             if not is_complete(output_dir, item_id)]
+    retries = {item_id for item_id, _ in items if previous_status(output_dir, item_id) == FAILED}
+
+    def run(item_id: str, prompt: str) -> Dict[str, Any]:
+        start = time.monotonic()
+        record: Dict[str, Any] = {"id": item_id, "prompt": prompt}
+        try:
+            # Cached responses would replay the failed solve exactly, so a retry samples afresh
+            kwargs = {"use_cache": False} if item_id in retries else {}
+            agent = agent_factory(client=shared_client, settings=settings, **kwargs)
+            record["result"] = agent.solve(prompt)
+            record["status"] = PASSED
+        except Exception as e:
+            record["status"] = FAILED
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["seconds"] = time.monotonic() - start
+        _write_result(output_dir, record)
+        return record
+
+    records: Dict[str, Dict[str, Any]] = {}
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-solve")
+    try:
+        futures = {executor.submit(run, item_id, prompt): item_id for item_id, prompt in items}
+        for future in as_completed(futures):
+            record = future.result()
+            records[record["id"]] = record
+            if on_result is not None:
+                on_result(record)
+    finally:
+        # On Ctrl-C, drop queued prompts; finished ones are already on disk
+        executor.shutdown(wait=True, cancel_futures=True)
+    return [records[item_id] for item_id, _ in items if item_id in records]
+
+
+def load_prompts(path: str) -> Union[List[str], Dict[str, str]]:
+    """Read prompts from JSONL (``{"id", "prompt"}`` per line) or plain text, one per line."""
+    with open(path) as f:
+        lines = [line.strip() for line in f if line.strip()]
+    if path.endswith(".jsonl"):
+        prompts = {}
+        for line in lines:
+            entry = json.loads(line)
+            prompts[entry.get("id") or prompt_id(entry["prompt"])] = entry["prompt"]
+        return prompts
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Solve a batch of animation prompts")
+    parser.add_argument("prompts", help="JSONL file of {id, prompt} or a text file with one prompt per line")
+    parser.add_argument("--output-dir", default="batch_results")
+    parser.add_argument("--concurrency", type=int, default=Config.BATCH_CONCURRENCY)
+    parser.add_argument("--rpm", type=int, default=Config.BATCH_REQUESTS_PER_MINUTE, help="requests per minute")
+    parser.add_argument("--tpm", type=int, default=Config.BATCH_TOKENS_PER_MINUTE, help="tokens per minute")
+    parser.add_argument("--quality", default=Config.MANIM_QUALITY)
+    args = parser.parse_args(argv)
+
+    prompts = load_prompts(args.prompts)
+
+    def report(record: Dict[str, Any]) -> None:
+        detail = record.get("error") or f"{record['result']['iterations']} iterations"
+        print(f"[{record['status']}] {record['id']} ({record['seconds']:.1f}s): {detail}", flush=True)
+
+    records = solve_many(prompts, args.output_dir, concurrency=args.concurrency,
+                         requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                         settings=RenderSettings(quality=args.quality, preview=False),
+                         on_result=report)
+    failed = sum(1 for record in records if record["status"] == FAILED)
+    print(f"{len(records) - failed}/{len(records)} prompts passed; results in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
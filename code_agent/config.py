@@ -1,4 +1,5 @@
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
 import os
 from dotenv import load_dotenv
 
@@ -7,7 +8,80 @@ load_dotenv()
 class Config:
     ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
     MODEL = "claude-3-5-sonnet-latest"
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
     MAX_ITERATIONS = 10
+
+    # Parallel candidate generation
+    NUM_CANDIDATES = 1  # implementations generated concurrently per iteration
+    MAX_CANDIDATES = None  # total candidate budget per solve, None = MAX_ITERATIONS * NUM_CANDIDATES
+    SOLVE_DEADLINE = None  # wall-clock seconds per solve, None = no deadline
+    CONTEXT_TOKEN_BUDGET = 6000  # approximate tokens of attempt history per prompt
+    SPECULATIVE_FIRST_ATTEMPT = True  # write the first implementation while the tests are generated
+    FOLD_FAILURE_ANALYSIS = True  # analyze failures in the next generation request, not a separate call
+    PATCH_REPAIR = os.getenv("PATCH_REPAIR", "1") != "0"  # fix failed attempts with search/replace edits
+
+    # LLM providers and the engine solves run on
+    MANIM_PROVIDER = os.getenv("MANIM_PROVIDER", "anthropic")  # anthropic or openai
+    CODE_PROVIDER = os.getenv("CODE_PROVIDER", "openai")
+    LLM_MAX_TOKENS = 4096  # response cap for providers that require one
+    LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "16"))  # in-flight calls per provider
+    LLM_MAX_RETRIES = 4  # retries of rate-limited, overloaded or dropped calls
+    LLM_RETRY_BASE_DELAY = 1.0  # seconds, doubled per retry with full jitter
+    LLM_RETRY_MAX_DELAY = 30.0
+    LLM_MAX_CONNECTIONS = 20  # pooled HTTP connections shared by every provider
+    LLM_TIMEOUT = 120  # seconds per HTTP request
+    ENGINE_THREADS = 64  # blocking steps (tests, renders) running at once across solves
+
+    # Test worker pool
+    TEST_WORKERS = min(4, os.cpu_count() or 1)
+    TEST_WORKER_MAX_JOBS = 50  # recycle a worker after this many test runs
+    TEST_WORKER_MAX_RSS_GROWTH_MB = 500  # recycle a worker once it grows this much
+    TEST_WORKER_STARTUP_TIMEOUT = 120
+    TEST_TIMEOUT = 120  # seconds per test run before the worker is killed
+    TEST_HEADLESS = True  # construct scenes without rendering frames during tests
+    TEST_FAIL_FAST = True  # run last iteration's failures first and stop on the first failure
+    FAILURE_DIGEST_MAX_CHARS = 2000  # failure text kept per test run
+
+    # Resource limits for generated code in test and render processes
+    SANDBOX_LIMITS = os.getenv("SANDBOX_LIMITS", "1") != "0"
+    TEST_CASE_TIMEOUT = 30  # wall-clock seconds per test function
+    TEST_CPU_SECONDS = 60  # CPU seconds per test run
+    TEST_MEMORY_MB = 2048  # address space a test run may add to the warm worker
+    TEST_OPEN_FILES = 256
+    TEST_OUTPUT_MB = 64  # largest file a test run may write
+    RENDER_TIMEOUT = 600  # wall-clock seconds per render process
+    RENDER_CPU_SECONDS = 1200
+    RENDER_MEMORY_MB = 4096
+    RENDER_OPEN_FILES = 1024
+    RENDER_OUTPUT_MB = 2048
+
+    # LLM response cache
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+    LLM_CACHE_MAX_BYTES = 100 * 1024 * 1024
+    LLM_CACHE_TTL = 7 * 24 * 3600  # seconds
+
+    # Reuse of validated test suites for near-duplicate prompts (MinHash LSH)
+    TEST_INDEX_ENABLED = os.getenv("TEST_INDEX_ENABLED", "1") != "0"
+    TEST_INDEX_PATH = os.getenv("TEST_INDEX_PATH", ".cache/test_index.sqlite3")
+    TEST_INDEX_THRESHOLD = 0.8  # estimated Jaccard similarity of prompt 4-grams; reuse also needs the same words
+    TEST_INDEX_BANDS = 16  # LSH bands x rows = MinHash permutations
+    TEST_INDEX_ROWS = 4
+
+    # Library of solved scenes retrieved as few-shot examples
+    EXAMPLES_ENABLED = os.getenv("EXAMPLES_ENABLED", "1") != "0"
+    EXAMPLES_PATH = os.getenv("EXAMPLES_PATH", ".cache/examples.sqlite3")
+    EXAMPLES_SEED_FILE = "manim_sandbox.py"  # relative to the repository root
+    EXAMPLES_TOP_K = 2
+    EXAMPLE_MAX_CHARS = 3000
+
+    # Provider prompt caching of static system prompts and per-solve test code
+    PROMPT_CACHING = os.getenv("PROMPT_CACHING", "1") != "0"
+
+    # Streaming code generation
+    LLM_STREAMING = os.getenv("LLM_STREAMING", "1") != "0"
+    STREAM_RETRIES = 2  # regenerations after a response is aborted for broken code
     
     # Manim rendering settings
     MANIM_QUALITY = "medium_quality"  # low_quality, medium_quality, high_quality, production_quality
@@ -16,8 +90,63 @@ class Config:
     MANIM_WIDTH = 1920
     MANIM_HEIGHT = 1080
     MANIM_FPS = 60
+    PREVIEW_QUALITY = "low_quality"  # quality of the first render in progressive mode
+
+    # Parallel sectioned rendering
+    RENDER_PARALLEL = os.getenv("RENDER_PARALLEL", "1") != "0"
+    RENDER_WORKERS = os.cpu_count() or 1
+    RENDER_MIN_ANIMATIONS_PER_SECTION = 2
+
+    # Background job queue
+    JOB_WORKERS = 4  # solves running at the same time
+    JOB_QUEUE_SIZE = 32  # solves waiting for a worker before submissions are refused
+    JOB_RETENTION = 3600  # seconds a finished job stays pollable
+    UPGRADE_ABANDON_AFTER = 30  # seconds without polling before a background render is cancelled
+    UPGRADE_WORKERS = 2  # background full-quality renders at the same time; the rest wait
+
+    # Render cache
+    RENDER_CACHE_ENABLED = os.getenv("RENDER_CACHE_ENABLED", "1") != "0"
+    RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", ".cache/renders")
+    RENDER_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+    # Rendered media and the local server that streams it to the browser
+    MEDIA_DIR = os.getenv("MEDIA_DIR", "media")  # manim's media_dir
+    MEDIA_SERVER_HOST = os.getenv("MEDIA_SERVER_HOST", "127.0.0.1")
+    MEDIA_SERVER_PORT = int(os.getenv("MEDIA_SERVER_PORT", "8502"))
+    MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL")  # how browsers reach the server, default http://localhost:<port>
+    MEDIA_RETENTION = 24 * 3600  # seconds before rendered files are deleted
+    MEDIA_CLEANUP_INTERVAL = 600  # seconds between retention sweeps
+
+    # Batch solving
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))  # prompts solved at the same time
+    BATCH_REQUESTS_PER_MINUTE = int(os.getenv("BATCH_REQUESTS_PER_MINUTE", "50"))
+    BATCH_TOKENS_PER_MINUTE = int(os.getenv("BATCH_TOKENS_PER_MINUTE", "40000"))
+
+    # Tracing: spans are always attached to solve results, export is optional
+    TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH")  # e.g. .cache/traces.jsonl
+    TRACE_OTEL = os.getenv("TRACE_OTEL", "0") == "1"  # needs opentelemetry-api
 
     @classmethod
     def validate(cls):
         if not cls.ANTHROPIC_API_KEY:
-            raise ValueError("ANTHROPIC_API_KEY not set in environment")
\ No newline at end of file
+            raise ValueError("ANTHROPIC_API_KEY not set in environment")
+
+
+@dataclass
+class RenderSettings:
+    """Per-request render settings, defaulting to the values in Config."""
+    quality: str = field(default_factory=lambda: Config.MANIM_QUALITY)
+    preview: bool = field(default_factory=lambda: Config.MANIM_PREVIEW)
+    format: str = field(default_factory=lambda: Config.MANIM_FORMAT)
+    # Render a PREVIEW_QUALITY preview first and the requested quality in the background
+    progressive: bool = False
+
+    def to_tempconfig(self) -> Dict[str, Any]:
+        return {
+            "quality": self.quality,
+            "preview": self.preview,
+            "format": self.format,
+            # "pixel_width": Config.MANIM_WIDTH,
+            # "pixel_height": Config.MANIM_HEIGHT,
+            # "frame_rate": Config.MANIM_FPS,
+        }
@@ -0,0 +1,60 @@
+"""The event loop every agent solve runs on.
+
+One engine per process owns an asyncio loop on a daemon thread. Solves are
+coroutines on that loop: they fan out candidates, wait on the first pass
+or the deadline and cancel the rest. Blocking work (tests, renders, the
+agents' own generation steps) runs on the step threads, and synchronous
+SDK clients on a separate I/O pool, so a step waiting on an LLM call can
+never starve the call it is waiting for.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from .config import Config
+
+T = TypeVar("T")
+
+
+class Engine:
+    def __init__(self, threads: Optional[int] = None, io_threads: Optional[int] = None):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="agent-engine", daemon=True)
+        self._thread.start()
+        self._steps = ThreadPoolExecutor(max_workers=threads or Config.ENGINE_THREADS,
+                                         thread_name_prefix="agent-step")
+        self._io = ThreadPoolExecutor(max_workers=io_threads or Config.LLM_CONCURRENCY,
+                                      thread_name_prefix="agent-io")
+
+    def submit(self, coro: Awaitable[T]) -> "Future[T]":
+        """Schedule a coroutine on the engine loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine on the engine loop and wait for its result."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Engine.run() would block the engine loop; await the coroutine instead")
+        return self.submit(coro).result()
+
+    async def step(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking agent step on the step threads."""
+        return await self.loop.run_in_executor(self._steps, functools.partial(fn, *args, **kwargs))
+
+    async def blocking_io(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a call of a synchronous client on the I/O threads."""
+        return await self.loop.run_in_executor(self._io, functools.partial(fn, *args, **kwargs))
+
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """Return the process-wide engine, starting it on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = Engine()
+        return _engine
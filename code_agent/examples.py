@@ -0,0 +1,167 @@
+import ast
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from . import preflight
+from .config import Config
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Words too common in animation prompts to say anything about the scene
+STOPWORDS = {
+    "a", "an", "and", "animation", "are", "as", "be", "by", "create", "each", "for", "from",
+    "how", "in", "is", "it", "manim", "of", "on", "or", "show", "shows", "that", "the",
+    "this", "to", "use", "using", "when", "while", "with",
+}
+
+
+@dataclass
+class Example:
+    prompt: str
+    test_code: str
+    implementation: str
+    score: float = 0.0
+
+
+def features(code: str) -> Set[str]:
+    """Capitalized names a piece of code calls or references, e.g. MathTex, Transform."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return set()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id[:1].isupper():
+            names.add(node.id)
+        elif isinstance(node, ast.Attribute) and node.attr[:1].isupper():
+            names.add(node.attr)
+    return names
+
+
+def keywords(text: str) -> List[str]:
+    words = re.findall(r"[a-z][a-z0-9]+", re.sub(r"([a-z])([A-Z])", r"\1 \2", text).lower())
+    return [word for word in words if word not in STOPWORDS]
+
+
+class ExampleLibrary:
+    """Solved (prompt, tests, implementation) triples, searchable with SQLite FTS5.
+
+    Prompts are matched lexically and the manim names used by an example's
+    implementation are matched against the ones its tests exercise, ranked
+    with BM25.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.EXAMPLES_PATH
+        self._lock = threading.Lock()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS examples (
+                id INTEGER PRIMARY KEY,
+                prompt TEXT NOT NULL UNIQUE,
+                test_code TEXT NOT NULL,
+                implementation TEXT NOT NULL,
+                features TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS examples_fts USING fts5(
+                prompt, features, content='examples', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS examples_insert AFTER INSERT ON examples BEGIN
+                INSERT INTO examples_fts (rowid, prompt, features)
+                VALUES (new.id, new.prompt, new.features);
+            END;
+            CREATE TRIGGER IF NOT EXISTS examples_delete AFTER DELETE ON examples BEGIN
+                INSERT INTO examples_fts (examples_fts, rowid, prompt, features)
+                VALUES ('delete', old.id, old.prompt, old.features);
+            END;
+        """)
+        self._db.commit()
+
+    def add(self, prompt: str, test_code: str, implementation: str) -> None:
+        """Store a solved prompt, replacing an earlier solution of the same prompt."""
+        with self._lock:
+            self._db.execute("DELETE FROM examples WHERE prompt = ?", (prompt,))
+            self._db.execute(
+                "INSERT INTO examples (prompt, test_code, implementation, features, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (prompt, test_code, implementation, " ".join(sorted(features(implementation))), time.time()),
+            )
+            self._db.commit()
+
+    def search(self, prompt: str, test_code: str = "", limit: Optional[int] = None) -> List[Example]:
+        """The ``limit`` best examples for a prompt and its tests."""
+        limit = limit or Config.EXAMPLES_TOP_K
+        terms = [f'prompt:"{word}"' for word in dict.fromkeys(keywords(prompt))]
+        terms += [f'features:"{name}"' for name in sorted(features(test_code))]
+        if not terms:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT e.prompt, e.test_code, e.implementation, bm25(examples_fts, 1.0, 0.5) AS rank "
+                "FROM examples_fts JOIN examples e ON e.id = examples_fts.rowid "
+                "WHERE examples_fts MATCH ? ORDER BY rank LIMIT ?",
+                (" OR ".join(terms), limit),
+            ).fetchall()
+        # bm25() is lower-is-better; flip it so larger scores mean more relevant
+        return [Example(prompt, tests, implementation, -rank) for prompt, tests, implementation, rank in rows]
+
+    def seed_from_file(self, path: str) -> int:
+        """Add every Scene in a module as an example; returns how many were added.
+
+        Scenes without a docstring get a prompt made of their class name and
+        comments. Scenes that fail the pre-flight checks are left out so they
+        are not imitated.
+        """
+        with open(path) as f:
+            source = f.read()
+        added = 0
+        for cls in preflight.scene_classes(ast.parse(source)):
+            implementation = ast.get_source_segment(source, cls)
+            if preflight.analyze(implementation):
+                continue
+            prompt = ast.get_docstring(cls) or " ".join(
+                [" ".join(keywords(cls.name))]
+                + [line.strip().lstrip("#").strip() for line in implementation.splitlines()
+                   if line.strip().startswith("#")]
+            )
+            self.add(prompt, "", implementation)
+            added += 1
+        return added
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM examples").fetchone()[0]
+
+
+def format_examples(examples: List[Example]) -> str:
+    """Examples as prompt text, each capped at EXAMPLE_MAX_CHARS."""
+    blocks = []
+    for i, example in enumerate(examples, 1):
+        implementation = example.implementation[:Config.EXAMPLE_MAX_CHARS]
+        blocks.append(f"Example {i} - {example.prompt[:200]}\n```python\n{implementation}\n```")
+    return "\n\n".join(blocks)
+
+
+_libraries: Dict[str, ExampleLibrary] = {}
+_libraries_lock = threading.Lock()
+
+
+def get_example_library(path: Optional[str] = None) -> ExampleLibrary:
+    """Return the process-wide library for ``path``, seeded on first use."""
+    path = path or Config.EXAMPLES_PATH
+    with _libraries_lock:
+        if path not in _libraries:
+            library = ExampleLibrary(path)
+            seed = os.path.join(PACKAGE_ROOT, Config.EXAMPLES_SEED_FILE)
+            if not len(library) and os.path.exists(seed):
+                library.seed_from_file(seed)
+            _libraries[path] = library
+        return _libraries[path]
@@ -8,4 +8,31 @@ class MaxIterationsReached(CodeAgentException):
 
 class TestGenerationError(CodeAgentException):
     """Raised when test generation fails"""
-    pass
\ No newline at end of file
+    pass
+
+class DeadlineExceeded(CodeAgentException):
+    """Raised when the wall-clock deadline passes without passing tests"""
+    pass
+
+class StreamAborted(CodeAgentException):
+    """Raised when a streamed response is abandoned because its code is broken"""
+    def __init__(self, message: str, text: str = ""):
+        super().__init__(message)
+        self.text = text
+
+class QueueFull(CodeAgentException):
+    """Raised when the job queue cannot accept more work"""
+    pass
+class RenderCancelled(CodeAgentException):
+    """Raised when a render is cancelled before it finishes"""
+    pass
+
+class ResourceLimitExceeded(CodeAgentException):
+    """Raised when generated code is stopped for exceeding a sandbox limit"""
+    def __init__(self, message: str, limit: str):
+        super().__init__(message)
+        self.limit = limit
+
+class PatchError(CodeAgentException):
+    """Raised when repair edits do not apply cleanly to the previous implementation"""
+    pass
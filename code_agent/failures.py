@@ -0,0 +1,133 @@
+"""Compact failure records built from pytest reports.
+
+A failing test becomes one record: the test, the phase, the exception type
+and message, the frame in the generated code where it happened, and for
+``==`` assertions the expected and actual values. Identical failures are
+merged and the rendered text is capped, so the attempt history sent back to
+the model stays small however long manim's tracebacks are.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import Config
+
+_EXCEPTION = re.compile(r"^((?:\w+\.)*\w+(?:Error|Exception|Exit|Interrupt|Timeout|Exceeded)):\s*")
+_COMPARISON = re.compile(r"^assert (.+?) == (.+)$")
+_MAX_MESSAGE = 300
+
+
+@dataclass
+class FailureRecord:
+    tests: List[str]  # test names, several once identical failures are merged
+    phase: str  # setup, call, teardown or collect
+    exception: str
+    message: str
+    location: str = ""  # e.g. "implementation line 6"
+    code: str = ""  # the source line at ``location``
+    expected: Optional[str] = None
+    actual: Optional[str] = None
+
+    def key(self) -> Tuple[str, str, str, str]:
+        return self.phase, self.exception, self.message, self.location
+
+    def to_text(self) -> str:
+        lines = [f"{', '.join(self.tests)} [{self.phase}] {self.exception}: {self.message}"]
+        if self.location:
+            lines.append(f"  at {self.location}: {self.code}" if self.code else f"  at {self.location}")
+        if self.expected is not None:
+            lines.append(f"  expected {self.expected}, got {self.actual}")
+        return "\n".join(lines)
+
+
+def _shorten(text: str, limit: int = _MAX_MESSAGE) -> str:
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _source_line(lines: Sequence[str]) -> str:
+    """The line a traceback entry points at, without pytest's markers."""
+    for line in lines:
+        if line.startswith(">"):
+            return line[1:].strip()
+    code = [line for line in lines if line.strip() and not line.startswith("E ") and set(line.strip()) != {"^"}]
+    return code[-1].strip() if code else ""
+
+
+def from_report(name: str, phase: str, longrepr: Any, files: Dict[str, Tuple[str, int]],
+                clean: Callable[[str], str] = lambda text: text) -> FailureRecord:
+    """Digest one failed pytest report.
+
+    ``files`` maps the basenames of the generated files to a label and the
+    number of prelude lines added in front of the model's code, so
+    locations point at the lines the model wrote. ``clean`` normalizes
+    message text (paths, object addresses).
+    """
+    crash = getattr(longrepr, "reprcrash", None)
+    entries = getattr(getattr(longrepr, "reprtraceback", None), "reprentries", None) or []
+    if crash is None:
+        # Collection errors and the like only come as text
+        text = clean(str(longrepr))
+        errors = [line[1:].strip() for line in text.splitlines() if line.startswith("E ")]
+        message = errors[-1] if errors else (text.strip().splitlines() or [""])[-1]
+        match = _EXCEPTION.match(message)
+        return FailureRecord([name], phase, match.group(1) if match else "Error",
+                             _shorten(message[match.end():] if match else message))
+
+    message = clean(crash.message)
+    match = _EXCEPTION.match(message)
+    if match:
+        exception, message = match.group(1).rsplit(".", 1)[-1], message[match.end():]
+    else:
+        last = getattr(getattr(entries[-1], "reprfileloc", None), "message", "") if entries else ""
+        exception = last if last and not last.startswith("in ") else "AssertionError"
+    # Keep the assertion and pytest's "where" explanations, not the full diff
+    message = "\n".join(message.splitlines()[:3])
+
+    record = FailureRecord([name], phase, exception, _shorten(message))
+    user_frames = []
+    for entry in entries:
+        location = getattr(entry, "reprfileloc", None)
+        if location is not None:
+            basename = location.path.replace("\\", "/").rsplit("/", 1)[-1]
+            if basename in files:
+                user_frames.append((files[basename], location.lineno, entry))
+    # The deepest frame in the implementation, else the failing test line
+    implementation = [frame for frame in user_frames if frame[0][0] == "implementation"]
+    frames = implementation or user_frames
+    if frames:
+        (label, offset), lineno, entry = frames[-1]
+        record.location = f"{label} line {lineno - offset}"
+        record.code = _shorten(clean(_source_line(entry.lines)), 200)
+
+    comparison = _COMPARISON.match(message.splitlines()[0]) if message else None
+    if comparison:
+        record.actual, record.expected = comparison.group(1), comparison.group(2)
+    return record
+
+
+def merge(records: Sequence[FailureRecord]) -> List[FailureRecord]:
+    """Merge failures that differ only in the test they came from."""
+    merged: Dict[Tuple[str, str, str, str], FailureRecord] = {}
+    for record in records:
+        key = record.key()
+        if key in merged:
+            merged[key].tests.extend(test for test in record.tests if test not in merged[key].tests)
+        else:
+            merged[key] = FailureRecord(**dict(record.__dict__, tests=list(record.tests)))
+    return list(merged.values())
+
+
+def render(records: Sequence[FailureRecord], max_chars: Optional[int] = None) -> str:
+    """Records as prompt text, at most ``max_chars`` long (FAILURE_DIGEST_MAX_CHARS)."""
+    max_chars = max_chars or Config.FAILURE_DIGEST_MAX_CHARS
+    parts: List[str] = []
+    used = 0
+    for i, record in enumerate(records):
+        text = record.to_text()
+        if used + len(text) > max_chars and parts:
+            parts.append(f"... {len(records) - i} more failures omitted")
+            break
+        parts.append(text[:max_chars])
+        used += len(text) + 1
+    return "\n".join(parts)
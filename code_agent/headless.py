@@ -0,0 +1,58 @@
+from typing import Any, List
+
+# Attributes install() adds to every Scene
+SCENE_ATTRIBUTES = {"animation_log", "get_animation_sequence"}
+
+
+def install() -> None:
+    """Switch manim in this process to construct-only test mode.
+
+    Animations jump straight to their end state, nothing is written to
+    disk and no frames are rendered, so ``construct()`` only builds the
+    scene structure. Every scene records its ``play``/``wait`` calls in
+    ``animation_log`` as ``("play", ["Create", "Write"])`` or
+    ``("wait", 1.0)`` entries, and ``get_animation_sequence()`` returns
+    the played animations other than waits.
+    """
+    from manim import Scene, Wait, config
+    try:
+        from manim.animation.animation import prepare_animation
+    except ImportError:
+        def prepare_animation(animation: Any) -> Any:
+            return animation
+
+    config.dry_run = True
+    config.write_to_movie = False
+    config.save_last_frame = False
+    config.disable_caching = True
+    config.preview = False
+    config.pixel_width = 160
+    config.pixel_height = 90
+    config.frame_rate = 1
+
+    original_init = Scene.__init__
+    original_play = Scene.play
+
+    def __init__(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        # CairoRenderer resets skip_animations from this before every play
+        self.renderer._original_skipping_status = True
+        self.renderer.skip_animations = True
+        self.animation_log = []
+        self._played_animations = []
+
+    def play(self, *args, **kwargs):
+        animations = [prepare_animation(arg) for arg in args]
+        if len(animations) == 1 and isinstance(animations[0], Wait):
+            self.animation_log.append(("wait", animations[0].run_time))
+        else:
+            self.animation_log.append(("play", [type(a).__name__ for a in animations]))
+            self._played_animations.extend(animations)
+        return original_play(self, *animations, **kwargs)
+
+    def get_animation_sequence(self) -> List[Any]:
+        return list(self._played_animations)
+
+    Scene.__init__ = __init__
+    Scene.play = play
+    Scene.get_animation_sequence = get_animation_sequence
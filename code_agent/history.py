@@ -0,0 +1,105 @@
+import re
+import threading
+from typing import List, Optional
+
+from .config import Config
+from .test_result import TestResult
+
+_ERROR_PATTERN = re.compile(r"\b(\w+(?:Error|Exception|Exit)\b[^\n\\]*)")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token."""
+    return (len(text) + 3) // 4
+
+
+def error_signature(result: TestResult, max_length: int = 120) -> str:
+    """Short description of the first error in a test result."""
+    match = _ERROR_PATTERN.search(result.output)
+    signature = match.group(1) if match else result.output.strip().splitlines()[0] if result.output.strip() else ""
+    signature = " ".join(signature.split())
+    if len(signature) > max_length:
+        signature = signature[:max_length - 3] + "..."
+    return signature
+
+
+class AttemptHistory:
+    """Previous attempts rendered into a prompt context under a token budget.
+
+    The latest attempt is kept in full. Older attempts are reduced to a
+    one-line summary when they are superseded, and the oldest summaries are
+    dropped once the budget is exceeded, so each context is built from
+    pieces computed once instead of from scratch.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None):
+        self.token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+        self.attempts: List[str] = []
+        self.results: List[TestResult] = []
+        self.context_sizes: List[int] = []  # estimated tokens of each built context
+        self._summaries: List[str] = []
+        self._summary_tokens = 0
+        self._dropped = 0
+        self._context: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.attempts)
+
+    def add(self, implementation: str, result: TestResult) -> None:
+        with self._lock:
+            if self.attempts:
+                summary = self._summarize(len(self.attempts), self.results[-1])
+                self._summaries.append(summary)
+                self._summary_tokens += estimate_tokens(summary)
+            self.attempts.append(implementation)
+            self.results.append(result)
+            self._context = None
+
+    def build_context(self) -> str:
+        """Return the context for the next generation request."""
+        with self._lock:
+            if not self.attempts:
+                return "This is the first attempt."
+            if self._context is None:
+                self._context = self._render()
+                self.context_sizes.append(estimate_tokens(self._context))
+            return self._context
+
+    def _render(self) -> str:
+        latest = self._render_latest()
+        remaining = self.token_budget - estimate_tokens(latest)
+        # Drop the oldest summaries until everything fits
+        while self._summaries and self._summary_tokens > remaining:
+            self._summary_tokens -= estimate_tokens(self._summaries.pop(0))
+            self._dropped += 1
+
+        context = "Previous attempts and their results:\n\n"
+        if self._dropped:
+            context += f"({self._dropped} earlier attempts omitted)\n"
+        if self._summaries:
+            context += "Earlier attempts (summarized):\n" + "\n".join(self._summaries) + "\n---\n"
+        return context + latest
+
+    def _render_latest(self) -> str:
+        number = len(self.attempts)
+        result = self.results[-1]
+        header = f"Attempt {number} (latest):\nImplementation:\n{self.attempts[-1]}\n"
+        footer = f"Failed Tests: {', '.join(result.failed_tests)}\n---\n"
+        output = result.output
+        # Only errors the output does not already show
+        extra = [error for error in result.manim_specific_errors if error not in output]
+        if extra:
+            output += f"\nManim Errors:\n{', '.join(extra)}"
+        # Keep the implementation and trim the test output if the attempt
+        # alone does not fit in the budget.
+        available = (self.token_budget - estimate_tokens(header + footer)) * 4
+        if len(output) > max(available, 0):
+            keep = max(available, 400)
+            output = output[:keep] + "\n... (truncated)"
+        return f"{header}Test Results:\n{output}\n{footer}"
+
+    @staticmethod
+    def _summarize(number: int, result: TestResult) -> str:
+        failed = ", ".join(name.split("::")[-1] for name in result.failed_tests) or "none"
+        return f"Attempt {number}: failed [{failed}] - {error_signature(result)}"
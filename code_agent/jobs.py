@@ -0,0 +1,139 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from .config import Config, RenderSettings
+from .exceptions import QueueFull
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    prompt: str
+    settings: RenderSettings
+    use_cache: Optional[bool] = None  # None: the agent's default (LLM_CACHE_ENABLED)
+    status: str = QUEUED
+    progress: str = "waiting for a worker"
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    last_polled: float = field(default_factory=time.time)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    @property
+    def is_active(self) -> bool:
+        """Still solving, or still rendering its upgrade."""
+        return not self.is_finished or (self.upgrade is not None and not self.upgrade.done)
+
+    @property
+    def upgrade(self) -> Any:
+        """Background full-quality render of a progressive job, if any."""
+        return (self.result or {}).get("upgrade")
+
+
+class JobQueue:
+    """Bounded pool of background solves that callers poll by job ID.
+
+    Submissions beyond ``workers`` running plus ``max_queued`` waiting jobs
+    are refused with QueueFull instead of piling up. A solved job whose
+    background render is still queued or running counts as active too.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queued: Optional[int] = None,
+                 agent_factory: Optional[Callable[..., Any]] = None):
+        self.workers = workers or Config.JOB_WORKERS
+        self.max_queued = max_queued if max_queued is not None else Config.JOB_QUEUE_SIZE
+        if agent_factory is None:
+            from .manim_agent import ManimAgent
+            agent_factory = ManimAgent
+        self.agent_factory = agent_factory
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="solve-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        threading.Thread(target=self._watch_upgrades, name="job-upgrade-watch", daemon=True).start()
+
+    def submit(self, prompt: str, settings: Optional[RenderSettings] = None,
+               use_cache: Optional[bool] = None) -> Job:
+        """Queue a solve; ``use_cache=False`` samples fresh responses instead of cached ones."""
+        with self._lock:
+            self._prune()
+            active = sum(1 for job in self._jobs.values() if job.is_active)
+            if active >= self.workers + self.max_queued:
+                raise QueueFull(f"{active} animations are already queued or running")
+            job = Job(id=uuid.uuid4().hex, prompt=prompt, settings=settings or RenderSettings(),
+                      use_cache=use_cache)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job; polling keeps its background render alive."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.last_polled = time.time()
+        return job
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel a job's background render, e.g. because the user regenerated."""
+        job = self.get(job_id)
+        if job is not None and job.upgrade is not None:
+            job.upgrade.cancel()
+
+    def _watch_upgrades(self) -> None:
+        # Nobody polled the job for a while: the user left, so stop rendering
+        while not self._stopped.wait(5):
+            cutoff = time.time() - Config.UPGRADE_ABANDON_AFTER
+            with self._lock:
+                jobs = list(self._jobs.values())
+            for job in jobs:
+                if job.upgrade is not None and not job.upgrade.done and job.last_polled < cutoff:
+                    job.upgrade.cancel()
+
+    def _run(self, job: Job) -> None:
+        job.status = RUNNING
+        job.progress = "starting"
+
+        def report(state: str) -> None:
+            job.progress = state
+
+        try:
+            kwargs = {} if job.use_cache is None else {"use_cache": job.use_cache}
+            agent = self.agent_factory(settings=job.settings, progress=report, **kwargs)
+            job.result = agent.solve(job.prompt)
+            job.status = DONE
+            job.progress = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            job.progress = "failed"
+        finally:
+            job.finished = time.time()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - Config.JOB_RETENTION
+        for job_id in [job.id for job in self._jobs.values()
+                       if job.finished is not None and job.finished < cutoff]:
+            job = self._jobs.pop(job_id)
+            if job.upgrade is not None:
+                job.upgrade.cancel()
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for job in list(self._jobs.values()):
+            if job.upgrade is not None:
+                job.upgrade.cancel()
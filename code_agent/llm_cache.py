@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .config import Config
+
+
+def make_key(request: Dict[str, Any], sample: int = 0) -> str:
+    """Content hash of an LLM request.
+
+    ``request`` holds model, system prompt, messages, temperature and
+    max_tokens. ``sample`` separates otherwise identical requests that are
+    meant to produce different samples, such as parallel candidates.
+    """
+    payload = json.dumps({"request": request, "sample": sample}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite store of LLM responses with a TTL and size-based LRU eviction."""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        self.path = path or Config.LLM_CACHE_PATH
+        self.max_bytes = max_bytes or Config.LLM_CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else Config.LLM_CACHE_TTL
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        if self.ttl:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        ).fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+
+_caches: Dict[str, LLMCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path: Optional[str] = None) -> LLMCache:
+    """Return the process-wide cache for ``path``."""
+    path = path or Config.LLM_CACHE_PATH
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = LLMCache(path)
+        return _caches[path]
@@ -1,39 +1,50 @@
-from anthropic import Anthropic
-from manim import *
-import pytest
 import tempfile
 import os
-from typing import Dict, List, Optional, Tuple
-from datetime import datetime
-from .config import Config
-from .exceptions import MaxIterationsReached, TestGenerationError
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import replace
+from .background_render import BackgroundRender
+from .base_agent import BaseAgent
+from .config import Config, RenderSettings
+from . import headless, patching, preflight
+from .examples import format_examples, get_example_library
+from .exceptions import PatchError, TestGenerationError
 from .test_result import TestResult
+from .parallel_render import render_in_subprocess, render_parallel
+from .providers import AnthropicProvider, Provider, get_provider
+from .render_cache import get_render_cache, make_key as render_cache_key
+from .test_index import get_test_index
+from .tracing import Span
+from .worker_pool import get_pool
 
-class ManimAgent(Scene):
-    def __init__(self, anthropic_key: Optional[str] = None, model: Optional[str] = None):
-        super().__init__()
-        self.client = Anthropic(api_key=anthropic_key or Config.ANTHROPIC_API_KEY)
-        self.model = model or Config.MODEL
-        self.max_iterations = Config.MAX_ITERATIONS
-        self.attempt_history = []
-        self.test_results_history = []
-        self.current_iteration = 0
-
-    def _build_implementation_context(self) -> str:
-        """Build context from previous implementation attempts."""
-        if not self.attempt_history:
-            return "This is the first attempt."
-            
-        context = "Previous attempts and their results:\n\n"
-        for i, (attempt, result) in enumerate(zip(self.attempt_history, self.test_results_history)):
-            context += f"Attempt {i+1}:\n"
-            context += f"Implementation:\n{attempt}\n"
-            context += f"Test Results:\n{result.output}\n"
-            if result.manim_specific_errors:
-                context += f"Manim Errors:\n{', '.join(result.manim_specific_errors)}\n"
-            context += "---\n"
-        
-        return context
+
+class ManimAgent(BaseAgent):
+    max_tokens = 2000
+    temperature = 0.7
+    supports_speculation = True
+
+    def __init__(self, anthropic_key: Optional[str] = None, model: Optional[str] = None,
+                 use_cache: Optional[bool] = None, settings: Optional[RenderSettings] = None,
+                 progress: Optional[Callable[[str], None]] = None,
+                 client: Any = None, provider: Optional[Provider] = None):
+        """``anthropic_key`` is the API key of the MANIM_PROVIDER backend.
+
+        A ``client`` (an Anthropic client or a wrapper around one) is used
+        instead of the shared one; ``provider`` replaces the backend.
+        """
+        if provider is None:
+            provider = (AnthropicProvider(client=client) if client is not None
+                        else get_provider(Config.MANIM_PROVIDER, anthropic_key))
+        super().__init__(provider, model=model, use_cache=use_cache, progress=progress)
+        self.settings = settings or RenderSettings()
+        self.test_pool = get_pool(
+            ("manim", "numpy", "code_agent.headless:install") if Config.TEST_HEADLESS else ("manim", "numpy")
+        )
+        self.render_cache = get_render_cache() if Config.RENDER_CACHE_ENABLED else None
+        self.test_index = get_test_index() if Config.TEST_INDEX_ENABLED else None
+        self.examples = get_example_library() if Config.EXAMPLES_ENABLED else None
+        self._few_shot: Tuple[Optional[Tuple[str, str]], str] = (None, "")
 
     def generate_test(self, prompt: str) -> str:
         """Generate Manim-specific test code."""
@@ -65,25 +76,26 @@ class ManimAgent(Scene):
             
         def test_animation_sequence():
             scene = MyScene()
+            scene.construct()
             animations = scene.get_animation_sequence()
             assert len(animations) > 0
             assert isinstance(animations[0], Create)
+            assert scene.animation_log[0] == ("play", ["Create"])
         ```
+
+        Tests run without rendering: animations jump to their end state,
+        scene.get_animation_sequence() returns the played animations and
+        scene.animation_log records ("play", [animation class names]) and
+        ("wait", duration) entries in call order.
         """
 
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=2000,
-                temperature=0.7,
-                system=system_prompt,
-                messages=[{
-                    "role": "user",
-                    "content": f"Write pytest tests for this Manim animation: {prompt}"
-                }]
+            test_code = self._create_message(
+                system_prompt,
+                f"Write pytest tests for this Manim animation: {prompt}",
+                stream_code=True,
+                phase="test_generation"
             )
-            
-            test_code = response.content[0].text
             # Clean up any markdown formatting
             if "```python" in test_code:
                 test_code = test_code.split("```python")[1].split("```")[0]
@@ -95,9 +107,66 @@ class ManimAgent(Scene):
         except Exception as e:
             raise TestGenerationError(f"Failed to generate tests: {str(e)}")
 
-    def generate_implementation(self, prompt: str, test_code: str) -> str:
-        """Generate Manim implementation code."""
+    def _find_tests(self, prompt: str) -> Optional[str]:
+        """Validated tests of an earlier, near-identical prompt, if the index has one."""
+        if self.test_index is None:
+            return None
+        with self.tracer.span("test_index") as span:
+            match = self.test_index.find(prompt)
+            span["hit"] = match is not None
+            if match is None:
+                return None
+            span["similarity"] = match.similarity
+        print(f"Reusing tests from a near-identical prompt ({match.similarity:.0%} similar): {match.prompt}")
+        return match.test_code
+
+    def _few_shot_examples(self, prompt: str, test_code: str) -> str:
+        """Solved scenes similar to this prompt and its tests, as prompt text.
+
+        Looked up once per prompt and test suite so every iteration sends the
+        same text and the cached prefix stays valid.
+        """
+        if self.examples is None:
+            return ""
+        key, text = self._few_shot
+        if key != (prompt, test_code):
+            with self.tracer.span("examples") as span:
+                found = self.examples.search(prompt, test_code)
+                span["count"] = len(found)
+                text = format_examples(found)
+            self._few_shot = ((prompt, test_code), text)
+        return text
+
+    def generate_implementation(self, prompt: str, test_code: str, sample: int = 0) -> str:
+        """Generate Manim implementation code.
+
+        ``sample`` distinguishes parallel candidates for the same context so
+        they are cached separately. An empty ``test_code`` asks for a
+        speculative implementation while the tests are still being written.
+        After a failed attempt the model first analyzes the failure in the
+        same response (FOLD_FAILURE_ANALYSIS), ahead of the code, and with
+        PATCH_REPAIR it answers with edits to the latest attempt instead of
+        a whole new scene.
+        """
         context = self._build_implementation_context()
+        if len(self.history) and not Config.FOLD_FAILURE_ANALYSIS and self._failure_analysis:
+            context += f"""
+
+Analysis of the latest failure:
+{self._failure_analysis}"""
+        if test_code:
+            tests = f"""The test code is:
+{test_code}"""
+        else:
+            # Same conventions as the test generation prompt, so the tests
+            # have a fair chance of matching
+            tests = """The tests are still being written. Name the scene class MyScene and keep every object the tests may check as an attribute of the scene (e.g. self.circle, self.equation)."""
+        examples = self._few_shot_examples(prompt, test_code)
+        if examples:
+            examples = f"""
+
+Passing implementations of similar animations, for reference:
+{examples}"""
         
         system_prompt = """You are an expert Manim developer.
         Create a precise, working implementation following these guidelines and examples:
@@ -149,27 +218,35 @@ class ManimAgent(Scene):
         ```
         """
         
+        # The prompt and tests stay the same for the whole solve, so they go
+        # first where the provider can cache them
+        cached_prefix = f"""Create a Manim implementation for: {prompt}
+
+{tests}{examples}"""
+        if len(self.history) and Config.PATCH_REPAIR:
+            repaired = self._repair_implementation(system_prompt, cached_prefix, context, sample)
+            if repaired is not None:
+                return repaired
+        if len(self.history) and Config.FOLD_FAILURE_ANALYSIS:
+            context += """
+
+Before the code, explain in a few sentences why the latest attempt failed and what you will change. Then give the complete implementation in a single ```python block."""
+
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=2000,
-                temperature=0.7,
-                system=system_prompt,
-                messages=[{
-                    "role": "user",
-                    "content": f"""Create a Manim implementation for: {prompt}
-
-Previous attempts context:
+            implementation = self._create_message(
+                system_prompt,
+                f"""Previous attempts context:
 {context}
 
-The test code is:
-{test_code}
-
-Important: Ensure proper f-string syntax and LaTeX escaping in all text elements."""
-                }]
+Important: Ensure proper f-string syntax and LaTeX escaping in all text elements.""",
+                cached_prefix=cached_prefix,
+                sample=sample,
+                stream_code=True,
+                phase="implementation"
             )
-            
-            implementation = response.content[0].text
+            analysis = implementation.split("```")[0].strip()
+            if analysis and len(self.history):
+                print(f"\nAnalysis: {analysis}")
             if "```python" in implementation:
                 implementation = implementation.split("```python")[1].split("```")[0]
             elif "```" in implementation:
@@ -180,12 +257,50 @@ Important: Ensure proper f-string syntax and LaTeX escaping in all text elements
         except Exception as e:
             raise TestGenerationError(f"Failed to generate implementation: {str(e)}")
 
-    def run_tests(self, test_code: str, implementation_code: str) -> TestResult:
-        """Run tests with Manim-specific error catching."""
-        start_time = datetime.now()
-        failed_tests = []
-        manim_errors = []
-        
+    def _repair_implementation(self, system_prompt: str, cached_prefix: str,
+                               context: str, sample: int) -> Optional[str]:
+        """Fix the latest attempt with search/replace edits.
+
+        Returns None when the edits are missing or do not apply cleanly, and
+        the caller regenerates the whole implementation.
+        """
+        analysis_step = ("First explain in a few sentences why it failed and what you will change, then give"
+                         if Config.FOLD_FAILURE_ANALYSIS else "Give")
+        with self.tracer.span("repair", sample=sample) as span:
+            try:
+                response = self._create_message(
+                    system_prompt,
+                    f"""Previous attempts context:
+{context}
+
+Fix the latest implementation with search/replace edits instead of rewriting it. {analysis_step} one or more edits in this format:
+{patching.FORMAT}
+Each SEARCH must copy lines of the latest implementation exactly, enough of them to be unique. Only if the scene needs a rewrite, give the complete implementation in a single ```python block instead.""",
+                    cached_prefix=cached_prefix,
+                    sample=sample,
+                    phase="repair"
+                )
+            except Exception as e:
+                span.update(applied=False, reason=f"{type(e).__name__}: {e}")
+                return None
+
+            analysis, edits = patching.parse_edits(response)
+            if not edits and "```python" in response:
+                # The model chose to rewrite the scene
+                span.update(applied=False, reason="rewrite")
+                return response.split("```python")[1].split("```")[0].strip()
+            try:
+                implementation = patching.apply_edits(self.history.attempts[-1], edits)
+            except PatchError as e:
+                print(f"\nEdits did not apply ({e}), regenerating the whole implementation")
+                span.update(applied=False, reason=str(e))
+                return None
+            span.update(applied=True, edits=len(edits))
+        if analysis:
+            print(f"\nAnalysis: {analysis}")
+        return implementation
+
+    def _run_tests(self, test_code: str, implementation_code: str) -> TestResult:
         # Pre-check implementation for common syntax errors
         try:
             compile(implementation_code, '<string>', 'exec')
@@ -198,120 +313,72 @@ Important: Ensure proper f-string syntax and LaTeX escaping in all text elements
                 manim_specific_errors=[str(e)]
             )
 
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as impl_file:
-            try:
-                full_implementation = "from manim import *\nimport numpy as np\n" + implementation_code
-                impl_file.write(full_implementation)
-                impl_path = impl_file.name
-            except Exception as e:
-                return TestResult(
-                    passed=False,
-                    output=f"Failed to write implementation: {str(e)}",
-                    failed_tests=["file_write"],
-                    execution_time=0,
-                    manim_specific_errors=[str(e)]
-                )
+        # Static pre-flight: reject obviously broken scenes in milliseconds
+        start_time = time.monotonic()
+        # manim's namespace comes from a test worker, which has it loaded anyway
+        names = self.test_pool.names(("manim", "manim:Scene")) or {}
+        findings = preflight.analyze(
+            implementation_code, test_code,
+            known_names=names.get("manim"),
+            scene_names=names.get("manim:Scene"),
+            scene_extras=headless.SCENE_ATTRIBUTES if Config.TEST_HEADLESS else ()
+        )
+        if findings:
+            return TestResult(
+                passed=False,
+                output="Static pre-flight check failed:\n" + "\n".join(str(f) for f in findings),
+                failed_tests=sorted({f"preflight::{f.check}" for f in findings}),
+                execution_time=time.monotonic() - start_time,
+                manim_specific_errors=[str(f) for f in findings]
+            )
 
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as test_file:
-            full_test = f"""
-import pytest
-from manim import *
-from {os.path.splitext(os.path.basename(impl_path))[0]} import *
+        return self.test_pool.run(
+            test_code,
+            implementation_code,
+            impl_prelude="from manim import *\nimport numpy as np\n",
+            test_prelude="import pytest\nfrom manim import *\n",
+            error_keywords=['VMobject', 'Camera', 'Scene', 'Animation', 'Transform'],
+            probes=self._probe_tests() if Config.TEST_FAIL_FAST else (),
+        )
 
-{test_code}
-"""
-            test_file.write(full_test)
-            test_path = test_file.name
+    def _probe_tests(self) -> List[str]:
+        """Tests that failed in the latest attempt, to be run first."""
+        if not self.test_results_history:
+            return []
+        return [name.split("::")[-1] for name in self.test_results_history[-1].failed_tests
+                if "::" in name and not name.startswith("preflight::")]
 
-        try:
-            class ManimTestPlugin:
-                def pytest_runtest_logreport(self, report):
-                    if report.failed:
-                        failed_tests.append({
-                            'name': report.nodeid,
-                            'error': report.longrepr,
-                            'phase': report.when
-                        })
-                        if any(keyword in str(report.longrepr) for keyword in 
-                              ['VMobject', 'Camera', 'Scene', 'Animation', 'Transform']):
-                            manim_errors.append(str(report.longrepr))
-
-            plugin = ManimTestPlugin()
-            result = pytest.main(["-v", test_path], plugins=[plugin])
-            
-            execution_time = (datetime.now() - start_time).total_seconds()
-            
-            return TestResult(
-                passed=len(failed_tests) == 0,
-                output=str(failed_tests),
-                failed_tests=[f['name'] for f in failed_tests],
-                execution_time=execution_time,
-                manim_specific_errors=manim_errors
-            )
-        finally:
-            os.unlink(impl_path)
-            os.unlink(test_path)
-
-    def solve(self, prompt: str) -> Dict[str, str]:
-        """Main method to generate and test Manim animations."""
-        print(f"Generating tests for prompt: {prompt}")
-        test_code = self.generate_test(prompt)
-        print("\nGenerated test code:")
-        print(test_code)
-        
-        while self.current_iteration < self.max_iterations:
-            print(f"\nIteration {self.current_iteration + 1}/{self.max_iterations}")
-            
-            implementation = self.generate_implementation(prompt, test_code)
-            print("\nGenerated implementation:")
-            print(implementation)
-            
-            test_result = self.run_tests(test_code, implementation)
-            
-            # Store attempt and results
-            self.attempt_history.append(implementation)
-            self.test_results_history.append(test_result)
-            
-            if test_result.passed:
-                print("\nAll tests passed!")
-                scene_class_name = self._extract_scene_class_name(implementation)
-                self._render_animation(implementation, scene_class_name)
-                return {
-                    "test_code": test_code,
-                    "implementation": implementation,
-                    "iterations": self.current_iteration + 1,
-                    "scene_class": scene_class_name
-                }
-            else:
-                print("\nTests failed. Analyzing failures...")
-                analysis = self._analyze_test_failure(test_result)
-                print(f"Analysis: {analysis}")
-                print("Generating new implementation...")
-            
-            self.current_iteration += 1
-        
-        raise MaxIterationsReached("Failed to generate passing implementation within max iterations")
+    def _on_pass(self, prompt: str, test_code: str, implementation: str,
+                 tests_reused: bool, candidates_used: int) -> Dict[str, Any]:
+        if self.test_index is not None and not tests_reused:
+            # An implementation passed, so the suite is known to be satisfiable
+            self.test_index.add(prompt, test_code)
+        if self.examples is not None:
+            self.examples.add(prompt, test_code, implementation)
+        scene_class_name = self._extract_scene_class_name(implementation)
+        self._report_progress("rendering")
+        video_path, video_quality, upgrade = self._render_progressive(implementation, scene_class_name)
+        result = super()._on_pass(prompt, test_code, implementation, tests_reused, candidates_used)
+        result.update(
+            scene_class=scene_class_name,
+            video_path=video_path,
+            video_quality=video_quality,
+            upgrade=upgrade,
+            skipped_test_executions=sum(r.skipped_executions for r in self.test_results_history),
+            llm_cache=self.llm_cache.stats() if self.llm_cache is not None else None,
+        )
+        return result
 
     def _extract_scene_class_name(self, implementation: str) -> str:
         """Extract the main scene class name from the implementation."""
-        import ast
-        tree = ast.parse(implementation)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef) and 'Scene' in [base.id for base in node.bases]:
-                return node.name
-        return "MainScene"  # Default name if not found
+        return preflight.find_scene_class(implementation) or "MainScene"  # Default name if not found
 
     def _analyze_test_failure(self, test_result: TestResult) -> str:
         """Analyze Manim-specific test failures."""
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=2000,
-                temperature=0.7,
-                system="You are a Manim expert. Analyze these test failures and provide specific guidance for fixing Manim animations.",
-                messages=[{
-                    "role": "user",
-                    "content": f"""
+            return self._create_message(
+                "You are a Manim expert. Analyze these test failures and provide specific guidance for fixing Manim animations.",
+                f"""
 Analyze these Manim test failures:
 
 Test Output:
@@ -325,55 +392,95 @@ Provide specific guidance on:
 2. Object transformation problems
 3. Mathematical accuracy issues
 4. Scene composition problems
-                    """
-                }]
+                    """,
+                phase="failure_analysis"
             )
             
-            return response.content[0].text
-            
         except Exception as e:
             return f"Failed to analyze test failures: {str(e)}"
 
-    def _render_animation(self, implementation: str, scene_class_name: str) -> None:
-        """Render the Manim animation."""
+    def _render_progressive(self, implementation: str,
+                            scene_class_name: str) -> Tuple[str, str, Optional[BackgroundRender]]:
+        """Render a quick preview and start the requested quality in the background.
+
+        Returns the video path, its quality and the background render, which
+        is None when the preview already is the requested quality or
+        progressive rendering is off.
+        """
+        if not self.settings.progressive or self.settings.quality == Config.PREVIEW_QUALITY:
+            return self._render_animation(implementation, scene_class_name), self.settings.quality, None
+
+        preview = replace(self.settings, quality=Config.PREVIEW_QUALITY, preview=False)
+        video_path = self._render_animation(implementation, scene_class_name, settings=preview)
+        upgrade = BackgroundRender(
+            lambda cancel: self._render_animation(implementation, scene_class_name, cancel=cancel),
+            self.settings.quality
+        )
+        return video_path, preview.quality, upgrade
+
+    def _render_animation(self, implementation: str, scene_class_name: str,
+                          settings: Optional[RenderSettings] = None,
+                          cancel: Optional[threading.Event] = None) -> str:
+        """Render the Manim animation and return the absolute path of its video file.
+
+        ``settings`` defaults to the agent's; setting ``cancel`` stops the
+        render with RenderCancelled.
+        """
+        video_format = (settings or self.settings).format
+        settings = (settings or self.settings).to_tempconfig()
+        key = None
+        if self.render_cache is not None:
+            # Opening a preview window does not change the output file
+            key = render_cache_key(implementation, scene_class_name,
+                                   {k: v for k, v in settings.items() if k != "preview"})
+            cached = self.render_cache.get(key, video_format)
+            if cached is not None:
+                print(f"\nUsing cached render: {cached}")
+                self.tracer.record(Span("render", time.time(), 0.0,
+                                        {"scene": scene_class_name, "cache_hit": True}))
+                return os.path.abspath(cached)
+
         with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
             f.write(f"from manim import *\n{implementation}")
             temp_path = f.name
 
         try:
-            import importlib.util
-            spec = importlib.util.spec_from_file_location("manim_module", temp_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
-            with tempconfig({
-                "quality": Config.MANIM_QUALITY,
-                "preview": Config.MANIM_PREVIEW,
-                "format": Config.MANIM_FORMAT,
-                # "pixel_width": Config.MANIM_WIDTH,
-                # "pixel_height": Config.MANIM_HEIGHT,
-                # "frame_rate": Config.MANIM_FPS,
-            }):
-                scene_class = getattr(module, scene_class_name)
-                scene = scene_class()
-                scene.render()
+            with self.tracer.span("render", scene=scene_class_name, cache_hit=False,
+                                  quality=settings.get("quality")) as span:
+                video_path = self._render_file(temp_path, scene_class_name, settings, span, cancel)
         finally:
             os.unlink(temp_path)
 
-    def _validate_implementation(self, implementation_code: str) -> List[str]:
-        """Validate implementation for common Manim issues."""
-        errors = []
-        
-        # Check for proper MathTex usage
-        if "\\text{" in implementation_code and not "r\"" in implementation_code:
-            errors.append("LaTeX text commands should use raw strings (r)")
-            
-        # Check for f-string syntax in MathTex
-        if "f\"\\text" in implementation_code:
-            errors.append("Avoid f-strings directly in LaTeX expressions")
-            
-        # Check for proper animation sequencing
-        if "self.play(" in implementation_code and "self.wait()" not in implementation_code:
-            errors.append("Animations should include wait() calls for proper timing")
-            
-        return errors
+        if key is not None:
+            self.render_cache.put(key, video_format, video_path)
+        return os.path.abspath(video_path)
+
+    def _render_file(self, temp_path: str, scene_class_name: str, settings: Dict,
+                     span: Dict, cancel: Optional[threading.Event] = None) -> str:
+        """Render a scene module, in parallel sections when possible."""
+        # Same layout as manim's own output, but unique per temp module: the
+        # scene is loaded without an input file, so manim's {module_name} is
+        # empty and every render would otherwise write to one path. Tex and
+        # image caches stay shared under media_dir.
+        video_dir = os.path.join(Config.MEDIA_DIR, "videos", os.path.splitext(os.path.basename(temp_path))[0],
+                                 settings["quality"])
+        settings = dict(settings, media_dir=Config.MEDIA_DIR, video_dir=video_dir)
+        video_path = None
+        if Config.RENDER_PARALLEL:
+            stats = {}
+            video_path = render_parallel(
+                temp_path, scene_class_name, settings,
+                os.path.join(video_dir, f"{scene_class_name}.{settings['format']}"),
+                stats=stats,
+                cancel=cancel
+            )
+            span.update(stats, parallel=video_path is not None)
+
+        if video_path is None:
+            # A render process of its own keeps manim and its global config
+            # out of the agent, and the video_dir keeps concurrent renders
+            # from overwriting each other's output
+            stats = render_in_subprocess(temp_path, scene_class_name, settings, cancel)
+            video_path = stats.pop("video_path")
+            span.update(stats)
+        return video_path
@@ -0,0 +1,200 @@
+"""Local HTTP server that streams rendered videos straight from disk.
+
+The Streamlit app hands the browser a URL instead of the video bytes, so a
+render is never read into memory. Range requests let players seek, and the
+file body goes out through ``socket.sendfile``.
+"""
+import mimetypes
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from .config import Config
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def cleanup_media(directory: str, max_age: float, now: Optional[float] = None) -> int:
+    """Delete files under ``directory`` not modified for ``max_age`` seconds.
+
+    Empty directories left behind are removed too. Returns the number of
+    files deleted.
+    """
+    cutoff = (now or time.time()) - max_age
+    removed = 0
+    for root, dirs, files in os.walk(directory, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except OSError:
+                pass  # vanished or in use; try again next time
+        if root != directory:
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass  # not empty
+    return removed
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single-range ``Range`` header, None for the whole file.
+
+    Raises ValueError for ranges that cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None  # multiple or unknown ranges: send the whole file
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        start = max(0, size - int(last))  # suffix range: the final N bytes
+        end = size - 1
+    else:
+        return None
+    if start >= size or start > end:
+        raise ValueError(f"range {header} outside file of {size} bytes")
+    return start, end
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    server: "_MediaHTTPServer"
+
+    def log_message(self, format: str, *args) -> None:
+        pass  # keep the app's console readable
+
+    def do_HEAD(self) -> None:
+        self._serve(send_body=False)
+
+    def do_GET(self) -> None:
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool) -> None:
+        url = urlsplit(self.path)
+        path = self.server.media.resolve(unquote(url.path))
+        if path is None or not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            try:
+                byte_range = parse_range(self.headers.get("Range"), size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            start, end = byte_range or (0, size - 1)
+            length = max(0, end - start + 1)
+
+            self.send_response(206 if byte_range else 200)
+            self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            if "download" in parse_qs(url.query):
+                self.send_header("Content-Disposition",
+                                 f'attachment; filename="{os.path.basename(path)}"')
+            self.end_headers()
+            if not send_body or length == 0:
+                return
+            self.wfile.flush()
+            try:
+                self.connection.sendfile(f, offset=start, count=length)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # players drop connections when seeking
+
+
+class _MediaHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], media: "MediaServer"):
+        self.media = media
+        super().__init__(address, _MediaHandler)
+
+
+class MediaServer:
+    """Serves files under ``roots`` at ``<base_url>/<root index>/<relative path>``.
+
+    Files under the first root are also deleted after ``retention``
+    seconds by a background sweep.
+    """
+
+    def __init__(self, roots: Sequence[str], host: Optional[str] = None,
+                 port: Optional[int] = None, base_url: Optional[str] = None,
+                 retention: Optional[float] = None):
+        self.roots: List[str] = [os.path.realpath(root) for root in roots]
+        self.host = host or Config.MEDIA_SERVER_HOST
+        self.port = Config.MEDIA_SERVER_PORT if port is None else port
+        self._base_url = base_url or Config.MEDIA_BASE_URL
+        self.retention = Config.MEDIA_RETENTION if retention is None else retention
+        self._server: Optional[_MediaHTTPServer] = None
+        self._stopped = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        if self._base_url:
+            return self._base_url.rstrip("/")
+        return f"http://localhost:{self._server.server_address[1]}"
+
+    def start(self) -> "MediaServer":
+        self._server = _MediaHTTPServer((self.host, self.port), self)
+        threading.Thread(target=self._server.serve_forever, name="media-server", daemon=True).start()
+        if self.retention:
+            threading.Thread(target=self._sweep, name="media-cleanup", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _sweep(self) -> None:
+        while not self._stopped.wait(Config.MEDIA_CLEANUP_INTERVAL):
+            cleanup_media(self.roots[0], self.retention)
+
+    def url_for(self, path: str) -> Optional[str]:
+        """URL of ``path``, or None if it is outside every served root."""
+        path = os.path.realpath(path)
+        for i, root in enumerate(self.roots):
+            if path.startswith(root + os.sep):
+                return f"{self.base_url}/{i}/{quote(os.path.relpath(path, root))}"
+        return None
+
+    def resolve(self, url_path: str) -> Optional[str]:
+        """File for a request path, refusing anything that escapes its root."""
+        index, _, relative = url_path.lstrip("/").partition("/")
+        if not index.isdigit() or int(index) >= len(self.roots) or not relative:
+            return None
+        root = self.roots[int(index)]
+        path = os.path.realpath(os.path.join(root, relative))
+        return path if path.startswith(root + os.sep) else None
+
+
+_server: Optional[MediaServer] = None
+_server_lock = threading.Lock()
+
+
+def get_media_server() -> MediaServer:
+    """Process-wide server for the media and render cache directories, started on first use."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            roots = [Config.MEDIA_DIR, Config.RENDER_CACHE_DIR]
+            for root in roots:
+                os.makedirs(root, exist_ok=True)
+            _server = MediaServer(roots).start()
+        return _server
@@ -0,0 +1,286 @@
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import sandbox
+from .config import Config
+from .exceptions import RenderCancelled, ResourceLimitExceeded
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Containers ffmpeg can join losslessly with the concat demuxer
+CONCAT_FORMATS = {"mp4", "mov", "webm"}
+
+
+def plan_sections(num_animations: int, workers: int, min_per_section: int) -> List[Tuple[int, int]]:
+    """Split animations 0..num_animations-1 into contiguous inclusive ranges."""
+    count = max(1, min(workers, num_animations // max(1, min_per_section)))
+    size, extra = divmod(num_animations, count)
+    sections = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0) - 1
+        sections.append((start, end))
+        start = end + 1
+    return sections
+
+
+def _run_worker(args: List[str]) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PACKAGE_ROOT, env.get("PYTHONPATH")]))
+    # Resolved here, not in the worker, so runtime Config changes apply
+    args = [*args, "--limits", sandbox.Limits.for_renders().to_json()]
+    return subprocess.Popen([sys.executable, "-m", "code_agent.parallel_render", *args],
+                            env=env, stdout=subprocess.DEVNULL, **sandbox.popen_kwargs())
+
+
+def _deadline() -> float:
+    return time.monotonic() + Config.RENDER_TIMEOUT
+
+
+def _read_result(process: subprocess.Popen, result_path: str,
+                 cancel: Optional[threading.Event] = None,
+                 deadline: Optional[float] = None) -> Dict[str, Any]:
+    """Wait for a worker and load its result.
+
+    The worker's process group is killed with RenderCancelled once
+    ``cancel`` is set, or with ResourceLimitExceeded at ``deadline``
+    (RENDER_TIMEOUT from now by default).
+    """
+    deadline = deadline or _deadline()
+    while process.poll() is None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            sandbox.kill_group(process)
+            raise ResourceLimitExceeded(f"Render did not finish within {Config.RENDER_TIMEOUT}s", "timeout")
+        if cancel is not None and cancel.wait(min(0.2, remaining)):
+            sandbox.kill_group(process)
+            raise RenderCancelled("Render cancelled")
+        if cancel is None:
+            try:
+                process.wait(timeout=min(0.2, remaining))
+            except subprocess.TimeoutExpired:
+                pass
+    if process.returncode != 0:
+        violation = sandbox.exit_violation(process.returncode)
+        if violation is None and os.path.exists(result_path):
+            try:
+                with open(result_path) as f:
+                    violation = json.load(f).get("limit_violation")
+            except ValueError:
+                pass  # died while writing something else
+        if violation is not None:
+            raise ResourceLimitExceeded(f"Render worker stopped by the {violation} limit", violation)
+        raise RuntimeError(f"Render worker exited with code {process.returncode}")
+    with open(result_path) as f:
+        return json.load(f)
+
+
+def count_animations(module_path: str, scene_class_name: str, workdir: str,
+                     cancel: Optional[threading.Event] = None) -> int:
+    """Number of play/wait calls the scene makes, found with a headless construct."""
+    result_path = os.path.join(workdir, "count.json")
+    process = _run_worker(["count", module_path, scene_class_name, "--result", result_path])
+    return _read_result(process, result_path, cancel)["animations"]
+
+
+def render_in_subprocess(module_path: str, scene_class_name: str, settings: Dict[str, Any],
+                         cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """Render a whole scene in a fresh process and return ``render_scene``'s stats.
+
+    Keeps manim, its global config and the generated code out of the
+    calling process. Setting ``cancel`` kills the render.
+    """
+    fd, result_path = tempfile.mkstemp(prefix="code_agent_render_", suffix=".json")
+    os.close(fd)
+    try:
+        process = _run_worker(["render", module_path, scene_class_name,
+                               "--settings", json.dumps(settings), "--result", result_path])
+        return _read_result(process, result_path, cancel)
+    finally:
+        os.unlink(result_path)
+
+
+def concat_videos(parts: List[str], output_path: str, ffmpeg: str = "ffmpeg") -> None:
+    """Join videos without re-encoding."""
+    list_path = output_path + ".parts.txt"
+    with open(list_path, "w") as f:
+        for part in parts:
+            escaped = os.path.abspath(part).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", list_path, "-c", "copy", output_path],
+            check=True,
+        )
+    finally:
+        os.unlink(list_path)
+
+
+def render_scene(scene: Any) -> Dict[str, Any]:
+    """Render a scene, timing manim's final movie assembly.
+
+    Returns the movie path, the number of frames written and the seconds
+    spent in the file writer's ``finish`` (combining partial movies).
+    """
+    writer = scene.renderer.file_writer
+    finish = writer.finish
+    timings = {"encode_time": 0.0}
+
+    def timed_finish(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return finish(*args, **kwargs)
+        finally:
+            timings["encode_time"] += time.perf_counter() - start
+
+    writer.finish = timed_finish
+    scene.render()
+    from manim import config
+    return {
+        "video_path": str(writer.movie_file_path),
+        # The renderer clock only advances for frames that were written
+        "frames": int(round(scene.renderer.time * config.frame_rate)),
+        "encode_time": timings["encode_time"],
+    }
+
+
+def render_parallel(module_path: str, scene_class_name: str, settings: Dict[str, Any],
+                    output_path: str, workers: Optional[int] = None,
+                    num_animations: Optional[int] = None,
+                    stats: Optional[Dict[str, Any]] = None,
+                    cancel: Optional[threading.Event] = None) -> Optional[str]:
+    """Render a scene in animation ranges across processes and join the parts.
+
+    Each range is rendered with manim's from/upto animation numbers, so the
+    concatenated movie has exactly the frames of a serial render. Returns
+    None when the scene is too short to split, its animations cannot be
+    counted, or the output format or a missing ffmpeg rules parallel
+    rendering out; the caller then renders serially. ``stats`` receives the section count, frames written and
+    encode time (slowest section's movie assembly plus the concat).
+    Setting ``cancel`` kills every running section.
+    """
+    stats = {} if stats is None else stats
+    workers = workers or Config.RENDER_WORKERS
+    ffmpeg = shutil.which("ffmpeg")
+    if workers < 2 or ffmpeg is None or settings.get("format", "mp4") not in CONCAT_FORMATS:
+        return None
+
+    workdir = tempfile.mkdtemp(prefix="code_agent_render_")
+    try:
+        if num_animations is None:
+            try:
+                num_animations = count_animations(module_path, scene_class_name, workdir, cancel)
+            except RenderCancelled:
+                raise
+            except Exception as e:
+                # A serial render reports the scene's own error, if it has one
+                print(f"\nCould not count animations ({type(e).__name__}: {e}), rendering serially")
+                return None
+        sections = plan_sections(num_animations, workers, Config.RENDER_MIN_ANIMATIONS_PER_SECTION)
+        if len(sections) < 2:
+            return None
+
+        # Sections run side by side, so they share one deadline
+        deadline = _deadline()
+        running = []
+        for i, (start, end) in enumerate(sections):
+            # The last section runs to the end of construct()
+            upto = -1 if i == len(sections) - 1 else end
+            section_dir = os.path.join(workdir, f"section_{i}")
+            section_settings = dict(settings, from_animation_number=start, upto_animation_number=upto,
+                                    media_dir=section_dir, video_dir=os.path.join(section_dir, "videos"),
+                                    preview=False)
+            result_path = os.path.join(workdir, f"section_{i}.json")
+            process = _run_worker(["render", module_path, scene_class_name,
+                                   "--settings", json.dumps(section_settings),
+                                   "--result", result_path])
+            running.append((process, result_path))
+
+        try:
+            results = [_read_result(process, result_path, cancel, deadline)
+                       for process, result_path in running]
+        finally:
+            for process, _ in running:
+                if process.poll() is None:
+                    sandbox.kill_group(process)
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        start = time.perf_counter()
+        concat_videos([result["video_path"] for result in results], output_path, ffmpeg)
+        stats.update(
+            sections=len(sections),
+            frames=sum(result["frames"] for result in results),
+            encode_time=max(result["encode_time"] for result in results) + time.perf_counter() - start,
+        )
+        return output_path
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# --- worker process side ---------------------------------------------------
+
+def _load_scene_class(module_path: str, scene_class_name: str) -> Any:
+    spec = importlib.util.spec_from_file_location("manim_module", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, scene_class_name)
+
+
+def _count(module_path: str, scene_class_name: str) -> Dict[str, Any]:
+    from . import headless
+    headless.install()
+    scene = _load_scene_class(module_path, scene_class_name)()
+    scene.construct()
+    return {"animations": len(scene.animation_log)}
+
+
+def _render(module_path: str, scene_class_name: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+    from manim import tempconfig
+    with tempconfig(settings):
+        return render_scene(_load_scene_class(module_path, scene_class_name)())
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Render worker: count animations or render a scene (or a section)")
+    parser.add_argument("mode", choices=["count", "render"])
+    parser.add_argument("module_path")
+    parser.add_argument("scene_class")
+    parser.add_argument("--settings", default="{}")
+    parser.add_argument("--result", required=True)
+    parser.add_argument("--limits", required=True, help="sandbox.Limits as JSON, resolved by the parent")
+    args = parser.parse_args(argv)
+    limits = sandbox.Limits.from_json(args.limits)
+
+    # Loaded before limiting, so the memory limit is headroom on top of manim
+    import manim  # noqa: F401
+    sandbox.apply(limits)
+    sandbox.set_cpu_budget(limits)
+    try:
+        if args.mode == "count":
+            result = _count(args.module_path, args.scene_class)
+        else:
+            result = _render(args.module_path, args.scene_class, json.loads(args.settings))
+    except Exception as e:
+        violation = sandbox.classify(f"{type(e).__name__}: {e}")
+        if violation is None:
+            raise
+        # Tell the parent which limit was hit rather than just "exit code 1"
+        with open(args.result, "w") as f:
+            json.dump({"limit_violation": violation, "error": str(e)}, f)
+        sys.exit(1)
+    with open(args.result, "w") as f:
+        json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Search/replace edits that repair a previous implementation.
+
+The model answers a repair request with blocks like::
+
+    <<<<<<< SEARCH
+            circle = Circle(radius=1)
+    =======
+            circle = Circle(radius=2)
+    >>>>>>> REPLACE
+
+which are far shorter than the whole scene. ``apply_edits`` applies them
+strictly: a search text has to match whole lines exactly once, ignoring
+only trailing whitespace and a uniform indentation shift, and the result
+has to compile.
+Anything else raises PatchError and the caller regenerates in full.
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from .exceptions import PatchError
+
+_FENCE = re.compile(r"```[\w+-]*")
+_BLOCK = re.compile(
+    r"^<{5,9} ?SEARCH[^\n]*\n(.*?)^={5,9}[ \t]*\n(.*?)^>{5,9} ?REPLACE[^\n]*$",
+    re.DOTALL | re.MULTILINE,
+)
+
+FORMAT = """<<<<<<< SEARCH
+exact lines from the latest implementation
+=======
+the lines that replace them
+>>>>>>> REPLACE"""
+
+
+@dataclass
+class Edit:
+    search: str
+    replace: str
+
+
+def parse_edits(response: str) -> Tuple[str, List[Edit]]:
+    """The text before the first edit (the model's analysis) and the edits."""
+    edits = [Edit(search.rstrip("\n"), replace.rstrip("\n")) for search, replace in _BLOCK.findall(response)]
+    first = _BLOCK.search(response)
+    preamble = response[:first.start()] if first else response
+    return _FENCE.sub("", preamble).strip(), edits
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _find_lines(lines: List[str], search: List[str]) -> List[int]:
+    """Start indexes where ``search`` matches whole ``lines``.
+
+    Lines are compared up to surrounding whitespace; when that matches
+    several places, only those that also agree on indentation count.
+    """
+    wanted = [line.strip() for line in search]
+    matches = [i for i in range(len(lines) - len(search) + 1)
+               if [line.strip() for line in lines[i:i + len(search)]] == wanted]
+    if len(matches) > 1:
+        exact = [line.rstrip() for line in search]
+        indented = [i for i in matches if [line.rstrip() for line in lines[i:i + len(search)]] == exact]
+        if indented:
+            return indented
+    return matches
+
+
+def _reindent(lines: List[str], old: str, new: str) -> List[str]:
+    """Move ``lines`` from indentation ``old`` to ``new``."""
+    if old == new:
+        return lines
+    shifted = []
+    for line in lines:
+        if line.startswith(old):
+            line = new + line[len(old):]
+        elif line.strip():
+            raise PatchError("replacement is indented less than the text it replaces")
+        shifted.append(line)
+    return shifted
+
+
+def apply_edit(code: str, edit: Edit) -> str:
+    if not edit.search.strip():
+        raise PatchError("empty SEARCH block")
+    # Whole lines only: models often get indentation or trailing spaces
+    # slightly wrong, and a match inside a line would edit unrelated code
+    lines = code.split("\n")
+    search = edit.search.split("\n")
+    matches = _find_lines(lines, search)
+    if len(matches) != 1:
+        problem = "not found" if not matches else f"matches {len(matches)} places"
+        raise PatchError(f"SEARCH text {problem}: {edit.search.strip().splitlines()[0]!r}")
+    start = matches[0]
+    first = next(i for i, line in enumerate(search) if line.strip())
+    replace = _reindent(edit.replace.split("\n"), _indent(search[first]), _indent(lines[start + first]))
+    return "\n".join(lines[:start] + replace + lines[start + len(search):])
+
+
+def apply_edits(code: str, edits: List[Edit], filename: Optional[str] = None) -> str:
+    """Apply ``edits`` in order and check that the result still compiles."""
+    if not edits:
+        raise PatchError("no edits")
+    for edit in edits:
+        code = apply_edit(code, edit)
+    try:
+        compile(code, filename or "<patched>", "exec")
+    except SyntaxError as e:
+        raise PatchError(f"patched code does not compile: {e}")
+    return code
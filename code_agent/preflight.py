@@ -0,0 +1,260 @@
+import ast
+import builtins
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+# Mobjects whose string arguments are compiled as LaTeX
+LATEX_MOBJECTS = {"MathTex", "Tex", "SingleStringMathTex", "Title", "BulletedList"}
+
+# Escapes Python turns into something other than a backslash: "\f" in
+# "\frac" becomes a form feed. "\\", quotes and unknown escapes such as
+# "\s" keep the backslash LaTeX needs.
+_PYTHON_ESCAPES = set("abfnrtv01234567xuUN")
+_ESCAPE = re.compile(r"\\.", re.DOTALL)
+
+# Scene attributes that are set in Scene.__init__ rather than on the class
+SCENE_INSTANCE_ATTRIBUTES = {
+    "renderer", "camera", "mobjects", "foreground_mobjects", "moving_mobjects",
+    "static_mobjects", "animations", "time", "duration", "last_t", "queue",
+    "skip_animation_preview", "meshes", "camera_target", "widgets", "updaters",
+    "point_lights", "ambient_light", "key_to_function_map", "mouse_press_callbacks",
+    "interactive_mode", "random_seed", "always_update_mobjects", "stop_condition",
+    "camera_class",
+}
+
+
+@dataclass
+class Finding:
+    check: str
+    message: str
+    line: Optional[int] = None
+
+    def __str__(self) -> str:
+        location = f"line {self.line}: " if self.line else ""
+        return f"[{self.check}] {location}{self.message}"
+
+
+# Fallback for dir(Scene) when the caller could not look it up
+SCENE_METHODS = {
+    "construct", "setup", "tear_down", "render", "play", "wait", "add", "remove",
+    "clear", "bring_to_front", "bring_to_back", "get_top_level_mobjects",
+    "get_mobject_family_members", "wait_until", "add_sound", "next_section", "get_attrs",
+}
+
+
+def scene_attributes(scene_names: Optional[Iterable[str]] = None) -> FrozenSet[str]:
+    """Attributes every Scene instance has, given ``dir(Scene)`` if known."""
+    return frozenset(SCENE_INSTANCE_ATTRIBUTES | set(scene_names or SCENE_METHODS))
+
+
+def _base_name(base: ast.expr) -> str:
+    if isinstance(base, ast.Name):
+        return base.id
+    if isinstance(base, ast.Attribute):
+        return base.attr
+    return ""
+
+
+def scene_classes(tree: ast.AST) -> List[ast.ClassDef]:
+    """Classes deriving from Scene, ThreeDScene, manim.Scene and the like."""
+    return [
+        node for node in ast.walk(tree)
+        if isinstance(node, ast.ClassDef)
+        and any(_base_name(base).endswith("Scene") for base in node.bases)
+    ]
+
+
+def find_scene_class(implementation: str) -> Optional[str]:
+    """Name of the first Scene subclass in ``implementation``."""
+    try:
+        classes = scene_classes(ast.parse(implementation))
+    except SyntaxError:
+        return None
+    return classes[0].name if classes else None
+
+
+def _bound_names(tree: ast.AST) -> Set[str]:
+    """Every name bound anywhere in the module, ignoring scopes."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+    return names
+
+
+def _star_imports_outside_manim(tree: ast.AST) -> bool:
+    return any(
+        isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names)
+        and (node.level or node.module.split(".")[0] != "manim")
+        for node in ast.walk(tree)
+    )
+
+
+def _check_names(tree: ast.AST, known_names: Iterable[str]) -> List[Finding]:
+    # The names a "from numpy import *" brings in are unknown here
+    if _star_imports_outside_manim(tree):
+        return []
+    defined = _bound_names(tree) | set(dir(builtins)) | set(known_names) | {"np"}
+    findings = []
+    seen = set()
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+                and node.id not in defined and node.id not in seen):
+            seen.add(node.id)
+            findings.append(Finding(
+                "undefined_name",
+                f"'{node.id}' is not defined and is not part of the manim namespace",
+                node.lineno,
+            ))
+    return findings
+
+
+def _assigned_attributes(cls: ast.ClassDef) -> Optional[Set[str]]:
+    """Attributes a class defines, or None if it sets attributes dynamically."""
+    names = set()
+    for node in cls.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                names.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+    for node in ast.walk(cls):
+        if (isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Store)
+                and isinstance(node.value, ast.Name) and node.value.id == "self"):
+            names.add(node.attr)
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+              and node.func.id == "setattr"):
+            return None
+        elif isinstance(node, ast.Attribute) and node.attr == "__dict__":
+            return None
+    return names
+
+
+def _check_test_attributes(impl_tree: ast.AST, test_tree: ast.AST,
+                           scene_names: Optional[Iterable[str]] = None,
+                           extra_attributes: Iterable[str] = ()) -> List[Finding]:
+    classes = {cls.name: cls for cls in ast.walk(impl_tree) if isinstance(cls, ast.ClassDef)}
+    scenes = {cls.name for cls in scene_classes(impl_tree)}
+    attributes: Dict[str, Optional[Set[str]]] = {}
+    for name in scenes:
+        # Include helper base classes defined in the implementation
+        defined: Optional[Set[str]] = set()
+        pending = [classes[name]]
+        while pending and defined is not None:
+            cls = pending.pop()
+            own = _assigned_attributes(cls)
+            defined = None if own is None else defined | own
+            pending.extend(classes[_base_name(b)] for b in cls.bases if _base_name(b) in classes)
+        attributes[name] = defined
+
+    known = scene_attributes(scene_names) | set(extra_attributes)
+    findings = []
+    reported = set()
+    for func in ast.walk(test_tree):
+        if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        instances = {}
+        for node in ast.walk(func):
+            if (isinstance(node, ast.Assign) and isinstance(node.value, ast.Call)
+                    and isinstance(node.value.func, ast.Name) and node.value.func.id in scenes):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        instances[target.id] = node.value.func.id
+        for node in ast.walk(func):
+            if not (isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Load)
+                    and isinstance(node.value, ast.Name) and node.value.id in instances):
+                continue
+            scene = instances[node.value.id]
+            defined = attributes[scene]
+            if defined is None or node.attr in defined or node.attr in known:
+                continue
+            if (scene, node.attr) not in reported:
+                reported.add((scene, node.attr))
+                findings.append(Finding(
+                    "missing_attribute",
+                    f"test '{func.name}' uses '{scene}.{node.attr}', which is never assigned on self",
+                    node.lineno,
+                ))
+    return findings
+
+
+def _latex_arguments(node: ast.expr) -> Iterable[ast.expr]:
+    if isinstance(node, ast.BinOp):
+        yield from _latex_arguments(node.left)
+        yield from _latex_arguments(node.right)
+    elif isinstance(node, (ast.Constant, ast.JoinedStr)):
+        yield node
+
+
+def _check_latex(tree: ast.AST, source: str) -> List[Finding]:
+    findings = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and _base_name(node.func) in LATEX_MOBJECTS):
+            continue
+        for arg in node.args:
+            for part in _latex_arguments(arg):
+                if isinstance(part, ast.Constant) and not isinstance(part.value, str):
+                    continue
+                segment = ast.get_source_segment(source, part) or ""
+                quote = min((i for i in (segment.find("'"), segment.find('"')) if i != -1), default=-1)
+                prefix = segment[:quote].lower() if quote != -1 else ""
+                if "r" in prefix:
+                    continue
+                # Matching left to right pairs up "\\" first, so "\\frac" is not read as "\f"
+                escapes = [e.group() for e in _ESCAPE.finditer(segment) if e.group()[1] in _PYTHON_ESCAPES]
+                if escapes:
+                    findings.append(Finding(
+                        "latex_not_raw",
+                        f"LaTeX string passed to {_base_name(node.func)} turns '{escapes[0]}' into an "
+                        f"escape sequence; use a raw string: {segment[:60]}",
+                        part.lineno,
+                    ))
+    return findings
+
+
+def analyze(implementation: str, test_code: Optional[str] = None,
+            known_names: Optional[Iterable[str]] = None,
+            scene_names: Optional[Iterable[str]] = None,
+            scene_extras: Iterable[str] = ()) -> List[Finding]:
+    """Run every static check on ``implementation``.
+
+    ``known_names`` is the manim namespace and ``scene_names`` is
+    ``dir(Scene)``. This module never imports manim: callers look them up
+    where manim is loaded, and the name check is skipped without them.
+    ``scene_extras`` are attributes the test environment adds to scenes.
+    """
+    try:
+        tree = ast.parse(implementation)
+    except SyntaxError as e:
+        return [Finding("syntax", str(e), e.lineno)]
+
+    findings = []
+    if not scene_classes(tree):
+        findings.append(Finding("scene_class", "no class deriving from Scene was found"))
+
+    if known_names is not None:
+        findings.extend(_check_names(tree, known_names))
+
+    if test_code:
+        try:
+            test_tree = ast.parse(test_code)
+        except SyntaxError:
+            test_tree = None
+        if test_tree is not None:
+            findings.extend(_check_test_attributes(tree, test_tree, scene_names, scene_extras))
+
+    findings.extend(_check_latex(tree, implementation))
+    return findings
@@ -0,0 +1,313 @@
+"""LLM backends behind one async interface.
+
+Agents describe a call as an ``LLMRequest``; a provider turns it into its
+SDK's request (``native``, also used for response cache keys) and runs it
+on the engine's event loop. Every provider bounds its concurrent calls,
+retries transient errors with exponential backoff and jitter, and, unless
+given a client of its own, talks through one connection-pooled HTTP client
+shared by the whole process.
+"""
+import asyncio
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from .config import Config
+from .history import estimate_tokens
+from .streaming import astream_code_response, stream_code_response
+from .tracing import add_usage
+
+# HTTP statuses worth another try: timeouts, conflicts, rate limits, overload
+_RETRY_STATUSES = {408, 409, 429}
+_RETRY_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "RemoteProtocolError"}
+
+
+@dataclass
+class LLMRequest:
+    model: str
+    system: str
+    content: str
+    # Text sent ahead of ``content`` that stays the same across a solve
+    cached_prefix: Optional[str] = None
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+def _cache_breakpoint(text: str) -> Dict:
+    """A text block the provider may cache, together with everything before it."""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def is_retryable(error: BaseException) -> bool:
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in _RETRY_STATUSES or status >= 500
+    return type(error).__name__ in _RETRY_ERRORS or isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, if it said."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def shared_http_client() -> Any:
+    """The process-wide pooled ``httpx.AsyncClient`` every SDK client uses."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            import httpx
+            _http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=Config.LLM_MAX_CONNECTIONS,
+                                    max_keepalive_connections=Config.LLM_MAX_CONNECTIONS),
+                timeout=httpx.Timeout(Config.LLM_TIMEOUT, connect=10.0),
+                follow_redirects=True,
+            )
+        return _http_client
+
+
+class Provider:
+    """One LLM backend. Subclasses implement ``native`` and ``_complete``."""
+
+    name = "provider"
+    supports_streaming = False
+
+    def __init__(self, concurrency: Optional[int] = None, max_retries: Optional[int] = None):
+        self.concurrency = concurrency or Config.LLM_CONCURRENCY
+        self.max_retries = Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def default_model(self) -> str:
+        raise NotImplementedError
+
+    def native(self, request: LLMRequest) -> Dict[str, Any]:
+        """The SDK request for ``request``."""
+        raise NotImplementedError
+
+    async def _complete(self, native: Dict[str, Any]) -> LLMResponse:
+        raise NotImplementedError
+
+    async def _stream_code(self, native: Dict[str, Any], usage: Dict[str, int]) -> str:
+        raise NotImplementedError
+
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        native = self.native(request)
+        return await self._with_retries(lambda: self._complete(native))
+
+    async def stream_code(self, request: LLMRequest, usage: Dict[str, int]) -> str:
+        """Stream a response up to the end of its first code block (see streaming.py)."""
+        native = self.native(request)
+        return await self._with_retries(lambda: self._stream_code(native, usage))
+
+    async def _with_retries(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    return await call()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                # Full jitter keeps concurrent solves from retrying in lockstep
+                delay = random.uniform(0, min(Config.LLM_RETRY_MAX_DELAY, Config.LLM_RETRY_BASE_DELAY * 2 ** attempt))
+                delay = max(delay, _retry_after(e) or 0.0)
+                print(f"\n{self.name} call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _blocking(fn: Callable[..., Any], **kwargs: Any) -> Any:
+        """Run a call of a synchronous client without blocking the event loop."""
+        from .engine import get_engine
+        return await get_engine().blocking_io(fn, **kwargs)
+
+
+def _is_async(client: Any) -> bool:
+    """Whether ``client`` is one of the SDKs' async clients (AsyncAnthropic, AsyncOpenAI)."""
+    return type(client).__name__.startswith("Async")
+
+
+class AnthropicProvider(Provider):
+    """Anthropic Messages API, with prompt caching and streamed code.
+
+    ``client`` may be a synchronous ``Anthropic`` client (or anything shaped
+    like one, such as the benchmark replay client); its calls then run on
+    the engine's I/O threads.
+    """
+
+    name = "anthropic"
+    supports_streaming = True
+
+    def __init__(self, client: Any = None, api_key: Optional[str] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._client = client
+        self._api_key = api_key
+        self._client_lock = threading.Lock()
+
+    @property
+    def default_model(self) -> str:
+        return Config.MODEL
+
+    @property
+    def client(self) -> Any:
+        with self._client_lock:
+            if self._client is None:
+                # The SDK is slow to import; only load it when a client is built here
+                from anthropic import AsyncAnthropic
+                self._client = AsyncAnthropic(api_key=self._api_key or Config.ANTHROPIC_API_KEY,
+                                              http_client=shared_http_client(), max_retries=0)
+            return self._client
+
+    def native(self, request: LLMRequest) -> Dict[str, Any]:
+        native: Dict[str, Any] = {"model": request.model, "max_tokens": request.max_tokens or Config.LLM_MAX_TOKENS}
+        if request.temperature is not None:
+            native["temperature"] = request.temperature
+        content: Union[str, List[Dict[str, Any]]] = request.content
+        if request.cached_prefix is not None:
+            content = f"{request.cached_prefix}\n\n{request.content}"
+        native["system"] = request.system
+        if Config.PROMPT_CACHING:
+            native["system"] = [_cache_breakpoint(request.system)]
+            if request.cached_prefix is not None:
+                content = [_cache_breakpoint(request.cached_prefix), {"type": "text", "text": request.content}]
+        native["messages"] = [{"role": "user", "content": content}]
+        return native
+
+    async def _complete(self, native: Dict[str, Any]) -> LLMResponse:
+        client = self.client
+        if _is_async(client):
+            response = await client.messages.create(**native)
+        else:
+            response = await self._blocking(client.messages.create, **native)
+        usage: Dict[str, int] = {}
+        add_usage(usage, response.usage)
+        return LLMResponse(response.content[0].text, usage)
+
+    async def _stream_code(self, native: Dict[str, Any], usage: Dict[str, int]) -> str:
+        client = self.client
+        if _is_async(client):
+            return await astream_code_response(client, native, usage)
+        return await self._blocking(stream_code_response, client=client, request=native, usage=usage)
+
+
+class OpenAIProvider(Provider):
+    """OpenAI Chat Completions; the prompt prefix is cached by OpenAI automatically."""
+
+    name = "openai"
+
+    def __init__(self, client: Any = None, api_key: Optional[str] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._client = client
+        self._api_key = api_key
+        self._client_lock = threading.Lock()
+
+    @property
+    def default_model(self) -> str:
+        return Config.OPENAI_MODEL
+
+    @property
+    def client(self) -> Any:
+        with self._client_lock:
+            if self._client is None:
+                from openai import AsyncOpenAI
+                self._client = AsyncOpenAI(api_key=self._api_key or Config.OPENAI_API_KEY,
+                                           http_client=shared_http_client(), max_retries=0)
+            return self._client
+
+    def native(self, request: LLMRequest) -> Dict[str, Any]:
+        content = request.content
+        if request.cached_prefix is not None:
+            content = f"{request.cached_prefix}\n\n{request.content}"
+        native: Dict[str, Any] = {
+            "model": request.model,
+            "messages": [
+                {"role": "system", "content": request.system},
+                {"role": "user", "content": content},
+            ],
+        }
+        if request.max_tokens is not None:
+            native["max_tokens"] = request.max_tokens
+        if request.temperature is not None:
+            native["temperature"] = request.temperature
+        return native
+
+    async def _complete(self, native: Dict[str, Any]) -> LLMResponse:
+        client = self.client
+        if _is_async(client):
+            response = await client.chat.completions.create(**native)
+        else:
+            response = await self._blocking(client.chat.completions.create, **native)
+        usage: Dict[str, int] = {}
+        add_usage(usage, response.usage)
+        return LLMResponse(response.choices[0].message.content, usage)
+
+
+class StubProvider(Provider):
+    """Offline provider for tests and demos.
+
+    ``respond`` is either a function from request to response text or a
+    sequence of responses returned in turn (the last one repeats).
+    """
+
+    name = "stub"
+
+    def __init__(self, respond: Union[Callable[[LLMRequest], str], Sequence[str]], **kwargs: Any):
+        super().__init__(**kwargs)
+        self._respond = respond
+        self._index = 0
+        self._lock = threading.Lock()
+        self.requests: List[LLMRequest] = []
+
+    @property
+    def default_model(self) -> str:
+        return "stub"
+
+    def native(self, request: LLMRequest) -> Dict[str, Any]:
+        return {"provider": self.name, **request.__dict__}
+
+    async def _complete(self, native: Dict[str, Any]) -> LLMResponse:
+        request = LLMRequest(**{k: v for k, v in native.items() if k != "provider"})
+        with self._lock:
+            self.requests.append(request)
+            if not callable(self._respond):
+                text = self._respond[min(self._index, len(self._respond) - 1)]
+                self._index += 1
+        if callable(self._respond):
+            # A slow or blocking respond must not stall the engine loop
+            text = await self._blocking(self._respond, request=request)
+        prompt = f"{request.system}{request.cached_prefix or ''}{request.content}"
+        return LLMResponse(text, {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(text)})
+
+
+_PROVIDERS: Dict[str, Callable[..., Provider]] = {
+    "anthropic": AnthropicProvider,
+    "openai": OpenAIProvider,
+}
+_providers: Dict[Tuple[str, Optional[str]], Provider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name: str, api_key: Optional[str] = None) -> Provider:
+    """Process-wide provider by name ("anthropic" or "openai"), one per API key."""
+    if name not in _PROVIDERS:
+        raise ValueError(f"Unknown LLM provider {name!r}; expected one of {sorted(_PROVIDERS)}")
+    with _providers_lock:
+        key = (name, api_key)
+        if key not in _providers:
+            _providers[key] = _PROVIDERS[name](api_key=api_key)
+        return _providers[key]
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from .config import Config
+
+
+def make_key(implementation: str, scene_class_name: str, settings: Dict[str, Any]) -> str:
+    """Content hash of everything that determines the rendered video."""
+    payload = json.dumps(
+        {"implementation": implementation, "scene_class": scene_class_name, "settings": settings},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Directory of rendered videos named by key, capped in size with LRU eviction.
+
+    A file's mtime doubles as its last-access time.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = directory or Config.RENDER_CACHE_DIR
+        self.max_bytes = max_bytes or Config.RENDER_CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def get(self, key: str, extension: str) -> Optional[str]:
+        path = self._path(key, extension)
+        with self._lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return path
+
+    def put(self, key: str, extension: str, video_path: str) -> str:
+        """Copy ``video_path`` into the cache and return the cached path."""
+        path = self._path(key, extension)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(video_path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_caches: Dict[str, RenderCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_render_cache(directory: Optional[str] = None) -> RenderCache:
+    """Return the process-wide render cache for ``directory``."""
+    directory = directory or Config.RENDER_CACHE_DIR
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = RenderCache(directory)
+        return _caches[directory]
@@ -0,0 +1,157 @@
+"""Resource limits for the processes that run generated code.
+
+The parent resolves ``Limits`` from Config and hands them to each test
+or render worker, which calls ``apply`` on startup to cap its address
+space, open files and written file size, and ``set_cpu_budget`` before
+each job. Workers never read the limits from their own Config, so
+changes made at runtime in the parent take effect.
+
+Exceeding a limit raises inside the generated code where possible
+(MemoryError, OSError, CpuTimeExceeded, TestTimeout) so the failure
+comes back as a test result; anything that cannot be interrupted
+is left to the caller's wall-clock timeout, which kills the whole process
+group with ``kill_group``.
+"""
+import json
+import os
+import signal
+import subprocess
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the wall-clock timeouts apply
+    resource = None
+
+from .config import Config
+
+# Substrings of a failure that identify the limit behind it
+LIMIT_ERRORS = {
+    "TestTimeout": "test_timeout",
+    "CpuTimeExceeded": "cpu",
+    "MemoryError": "memory",
+    "File too large": "output",
+    "Too many open files": "open_files",
+}
+
+
+class TestTimeout(Exception):
+    """A single test ran past TEST_CASE_TIMEOUT."""
+
+
+class CpuTimeExceeded(Exception):
+    """The job used up its CPU budget."""
+
+
+@dataclass
+class Limits:
+    cpu_seconds: int
+    memory_mb: int
+    open_files: int
+    output_mb: int
+    enabled: bool = True  # SANDBOX_LIMITS
+
+    @classmethod
+    def for_tests(cls) -> "Limits":
+        return cls(Config.TEST_CPU_SECONDS, Config.TEST_MEMORY_MB,
+                   Config.TEST_OPEN_FILES, Config.TEST_OUTPUT_MB, Config.SANDBOX_LIMITS)
+
+    @classmethod
+    def for_renders(cls) -> "Limits":
+        return cls(Config.RENDER_CPU_SECONDS, Config.RENDER_MEMORY_MB,
+                   Config.RENDER_OPEN_FILES, Config.RENDER_OUTPUT_MB, Config.SANDBOX_LIMITS)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, text: str) -> "Limits":
+        return cls(**json.loads(text))
+
+
+def _vm_size() -> Optional[int]:
+    """Current address space of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _set_soft_limit(kind: int, value: int) -> None:
+    soft, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    try:
+        resource.setrlimit(kind, (value, hard))
+    except (ValueError, OSError):
+        pass  # not supported here (e.g. RLIMIT_AS on macOS)
+
+
+def apply(limits: Limits) -> None:
+    """Limit this process; call after the heavy imports are done.
+
+    The memory limit is counted on top of the address space already in
+    use, so a worker with manim loaded keeps the same headroom.
+    """
+    if resource is None or not limits.enabled:
+        return
+    _set_soft_limit(resource.RLIMIT_NOFILE, limits.open_files)
+    _set_soft_limit(resource.RLIMIT_FSIZE, limits.output_mb * 1024 * 1024)
+    # Writes past the limit then fail with EFBIG instead of killing the process
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    vm_size = _vm_size()
+    if vm_size is not None:
+        _set_soft_limit(resource.RLIMIT_AS, vm_size + limits.memory_mb * 1024 * 1024)
+
+    def cpu_exceeded(signum: int, frame: Any) -> None:
+        raise CpuTimeExceeded(f"CPU time limit of {limits.cpu_seconds}s exceeded")
+
+    signal.signal(signal.SIGXCPU, cpu_exceeded)
+
+
+def set_cpu_budget(limits: Limits) -> None:
+    """Allow ``limits.cpu_seconds`` more CPU time from now, then SIGXCPU every second.
+
+    Only the soft limit moves, so a long-lived worker can grant each job a
+    fresh budget.
+    """
+    if resource is None or not limits.enabled:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _set_soft_limit(resource.RLIMIT_CPU, int(usage.ru_utime + usage.ru_stime) + limits.cpu_seconds)
+
+
+def classify(text: str) -> Optional[str]:
+    """The limit a failure message points to, if any."""
+    for marker, limit in LIMIT_ERRORS.items():
+        if marker in text:
+            return limit
+    return None
+
+
+def exit_violation(returncode: Optional[int]) -> Optional[str]:
+    """The limit behind a process exit, for signals only rlimits send."""
+    if returncode == -signal.SIGXCPU:
+        return "cpu"
+    if returncode == -signal.SIGXFSZ:
+        return "output"
+    return None
+
+
+def popen_kwargs() -> Dict[str, Any]:
+    """Start a child in its own process group so everything it spawns can be killed."""
+    return {"start_new_session": True} if hasattr(os, "killpg") else {}
+
+
+def kill_group(process: subprocess.Popen) -> None:
+    """Kill a process started with ``popen_kwargs`` and everything it spawned."""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass  # already gone
+    else:
+        process.kill()
+    process.wait()
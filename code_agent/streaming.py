@@ -0,0 +1,116 @@
+from typing import Any, Dict, List, Optional
+
+from .exceptions import StreamAborted
+
+# Syntax errors that only mean the code seen so far is unfinished
+_INCOMPLETE_MARKERS = ("was never closed", "unterminated triple-quoted", "unexpected EOF")
+# Lines at column 0 that continue the previous statement instead of starting one
+_CONTINUATION_PREFIXES = ("else", "elif", "except", "finally", ")", "]", "}", "#", "@")
+
+
+class CodeStreamMonitor:
+    """Watches a streamed response for the end of its first code block.
+
+    ``feed`` returns True once the closing fence has arrived, at which
+    point ``text`` holds the response up to and including that fence.
+    While the block is still open, every complete top-level statement is
+    compiled and StreamAborted is raised as soon as one is broken.
+    """
+
+    def __init__(self, check_syntax: bool = True):
+        self.check_syntax = check_syntax
+        self.text = ""
+        self.complete = False
+        self._code_start = None
+        self._checked_lines = 0
+
+    def feed(self, chunk: str) -> bool:
+        self.text += chunk
+        if self._code_start is None:
+            fence = self.text.find("```")
+            newline = self.text.find("\n", fence) if fence != -1 else -1
+            if newline == -1:
+                return False
+            self._code_start = newline + 1
+
+        body = self.text[self._code_start:]
+        end = 0 if body.startswith("```") else body.find("\n```")
+        if end != -1:
+            self.text = self.text[:self._code_start + end] + "\n```"
+            self.complete = True
+            return True
+        if self.check_syntax:
+            self._check(body.split("\n")[:-1])
+        return False
+
+    def _check(self, lines: List[str]) -> None:
+        boundary = None
+        for i in range(len(lines) - 1, self._checked_lines, -1):
+            line = lines[i]
+            if (line and not line[0].isspace() and not line.startswith(_CONTINUATION_PREFIXES)
+                    and not self._is_decorated(lines, i)):
+                boundary = i
+                break
+        if boundary is None:
+            return
+        self._checked_lines = boundary
+        try:
+            compile("\n".join(lines[:boundary]), "<stream>", "exec")
+        except SyntaxError as e:
+            if not any(marker in str(e) for marker in _INCOMPLETE_MARKERS):
+                raise StreamAborted(f"Broken code in streamed response: {e}", self.text)
+
+    @staticmethod
+    def _is_decorated(lines: List[str], i: int) -> bool:
+        """Whether the definition at line ``i`` has decorators, which belong to its statement."""
+        for line in reversed(lines[:i]):
+            if line.startswith("@"):
+                return True
+            if line and not line[0].isspace() and not line.startswith(_CONTINUATION_PREFIXES):
+                return False
+        return False
+
+
+def _handle_event(event: Any, monitor: CodeStreamMonitor, usage: Dict[str, int]) -> bool:
+    """Record one stream event; True once the code block is complete."""
+    if event.type == "message_start":
+        message_usage = event.message.usage
+        for name in ("input_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"):
+            if isinstance(getattr(message_usage, name, None), int):
+                usage[name] = getattr(message_usage, name)
+    elif event.type == "message_delta":
+        usage["output_tokens"] = event.usage.output_tokens
+    elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+        return monitor.feed(event.delta.text)
+    return False
+
+
+def stream_code_response(client: Any, request: Dict[str, Any],
+                         usage: Optional[Dict[str, int]] = None) -> str:
+    """Stream a message and stop reading once its first code block is closed.
+
+    Token counts from the stream events are written into ``usage``. Output
+    tokens are only reported by the final event, so for a response cut
+    short at its closing fence they are left out.
+    """
+    monitor = CodeStreamMonitor()
+    usage = {} if usage is None else usage
+    # Leaving the context manager closes the connection, so nothing after
+    # the code block is read.
+    with client.messages.stream(**request) as stream:
+        for event in stream:
+            if _handle_event(event, monitor, usage):
+                break
+    return monitor.text
+
+
+async def astream_code_response(client: Any, request: Dict[str, Any],
+                                usage: Optional[Dict[str, int]] = None) -> str:
+    """``stream_code_response`` for an async client."""
+    monitor = CodeStreamMonitor()
+    usage = {} if usage is None else usage
+    async with client.messages.stream(**request) as stream:
+        async for event in stream:
+            if _handle_event(event, monitor, usage):
+                break
+    return monitor.text
@@ -0,0 +1,223 @@
+import hashlib
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set
+
+from .config import Config
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+# Shorter words are too often a different word one edit away ("red", "right")
+_TYPO_MIN_LENGTH = 6
+
+
+def normalize(prompt: str) -> str:
+    """Lowercase, punctuation dropped, whitespace collapsed."""
+    return " ".join(re.sub(r"[^\w\s]", " ", prompt.lower()).split())
+
+
+def shingles(prompt: str, size: int = 4) -> Set[str]:
+    """Character ``size``-grams of the normalized prompt, so typos only touch a few."""
+    text = normalize(prompt)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def numbers(prompt: str) -> FrozenSet[str]:
+    """Numbers in a prompt; "2x2" and "3x3" matrices need different tests."""
+    return frozenset(_NUMBER.findall(prompt))
+
+
+def _one_edit_apart(first: str, second: str) -> bool:
+    """Whether one insertion, deletion, substitution or swap of neighbours separates two words."""
+    if abs(len(first) - len(second)) > 1:
+        return False
+    i = 0
+    while i < min(len(first), len(second)) and first[i] == second[i]:
+        i += 1
+    rest_first, rest_second = first[i:], second[i:]
+    return (rest_first[1:] == rest_second[1:] or rest_first[1:] == rest_second
+            or rest_first == rest_second[1:]
+            or rest_first[:2] == rest_second[1::-1] and rest_first[2:] == rest_second[2:])
+
+
+def same_words(first: str, second: str) -> bool:
+    """Whether two prompts say the same thing up to case, punctuation and typos.
+
+    The normalized words must match one for one; a word of at least
+    ``_TYPO_MIN_LENGTH`` characters without digits may be one edit off.
+    """
+    first_words, second_words = normalize(first).split(), normalize(second).split()
+    if len(first_words) != len(second_words):
+        return False
+    for a, b in zip(first_words, second_words):
+        if a == b:
+            continue
+        if (max(len(a), len(b)) < _TYPO_MIN_LENGTH or any(c.isdigit() for c in a + b)
+                or not _one_edit_apart(a, b)):
+            return False
+    return True
+
+
+class MinHasher:
+    """MinHash signatures from ``num_perm`` universal hash functions."""
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        self.num_perm = num_perm
+        params = hashlib.shake_256(f"minhash-{seed}".encode()).digest(16 * num_perm)
+        self._params = [
+            (int.from_bytes(params[16 * i:16 * i + 8], "little") % (_MERSENNE_PRIME - 1) + 1,
+             int.from_bytes(params[16 * i + 8:16 * i + 16], "little") % _MERSENNE_PRIME)
+            for i in range(num_perm)
+        ]
+
+    def signature(self, items: Set[str]) -> List[int]:
+        hashes = [int.from_bytes(hashlib.blake2b(item.encode(), digest_size=4).digest(), "little")
+                  for item in items]
+        return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+                for a, b in self._params]
+
+
+def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+    """Jaccard similarity estimated from two signatures."""
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+@dataclass
+class IndexMatch:
+    prompt: str
+    test_code: str
+    similarity: float
+
+
+class TestSuiteIndex:
+    """SQLite index of prompts with validated tests, searched with MinHash LSH.
+
+    Each signature is split into ``bands`` bands of ``rows`` values. A
+    prompt only has to match an entry in one band to become a candidate,
+    so lookups touch a handful of rows however large the index grows.
+    Similar text is not enough to reuse tests ("addition" and
+    "multiplication" prompts share most 4-grams), so a candidate must also
+    have the same words as the prompt, give or take a typo.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: Optional[float] = None,
+                 bands: Optional[int] = None, rows: Optional[int] = None):
+        self.path = path or Config.TEST_INDEX_PATH
+        self.threshold = threshold if threshold is not None else Config.TEST_INDEX_THRESHOLD
+        self.bands = bands or Config.TEST_INDEX_BANDS
+        self.rows = rows or Config.TEST_INDEX_ROWS
+        self.hasher = MinHasher(self.bands * self.rows)
+        self._lock = threading.Lock()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        # Inserts happen once per solve; losing the last one in a power cut is fine
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS suites (
+                id INTEGER PRIMARY KEY,
+                prompt TEXT NOT NULL UNIQUE,
+                signature BLOB NOT NULL,
+                test_code TEXT NOT NULL,
+                created REAL NOT NULL,
+                uses INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                suite_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket);
+        """)
+        self._db.commit()
+
+    def _signature(self, prompt: str) -> List[int]:
+        return self.hasher.signature(shingles(prompt))
+
+    def _buckets(self, signature: List[int]) -> List[int]:
+        buckets = []
+        for band in range(self.bands):
+            values = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(struct.pack(f"<{self.rows}I", *values), digest_size=8).digest()
+            buckets.append(int.from_bytes(digest, "little", signed=True))
+        return buckets
+
+    def add(self, prompt: str, test_code: str) -> None:
+        """Insert or replace the tests for ``prompt``."""
+        signature = self._signature(prompt)
+        with self._lock:
+            row = self._db.execute("SELECT id FROM suites WHERE prompt = ?", (prompt,)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE suites SET test_code = ? WHERE id = ?", (test_code, row[0]))
+            else:
+                suite_id = self._db.execute(
+                    "INSERT INTO suites (prompt, signature, test_code, created) VALUES (?, ?, ?, ?)",
+                    (prompt, struct.pack(f"<{len(signature)}I", *signature), test_code, time.time()),
+                ).lastrowid
+                self._db.executemany(
+                    "INSERT INTO buckets (band, bucket, suite_id) VALUES (?, ?, ?)",
+                    [(band, bucket, suite_id) for band, bucket in enumerate(self._buckets(signature))],
+                )
+            self._db.commit()
+
+    def find(self, prompt: str) -> Optional[IndexMatch]:
+        """Most similar stored prompt with the same words, if any."""
+        signature = self._signature(prompt)
+        wanted_numbers = numbers(prompt)
+        buckets = self._buckets(signature)
+        with self._lock:
+            candidates = [row[0] for row in self._db.execute(
+                "SELECT DISTINCT suite_id FROM buckets WHERE "
+                + " OR ".join(["(band = ? AND bucket = ?)"] * len(buckets)),
+                [value for band, bucket in enumerate(buckets) for value in (band, bucket)],
+            )]
+            best: Optional[IndexMatch] = None
+            best_id = None
+            scored = []
+            # Chunked to stay under SQLite's bound parameter limit
+            for start in range(0, len(candidates), 500):
+                chunk = candidates[start:start + 500]
+                for suite_id, blob in self._db.execute(
+                    f"SELECT id, signature FROM suites WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ):
+                    score = similarity(signature, struct.unpack(f"<{len(signature)}I", blob))
+                    if score >= self.threshold:
+                        scored.append((score, suite_id))
+            # Best first; only the few above the threshold need their text loaded
+            for score, suite_id in sorted(scored, reverse=True):
+                stored_prompt, test_code = self._db.execute(
+                    "SELECT prompt, test_code FROM suites WHERE id = ?", (suite_id,)
+                ).fetchone()
+                if numbers(stored_prompt) == wanted_numbers and same_words(stored_prompt, prompt):
+                    best, best_id = IndexMatch(stored_prompt, test_code, score), suite_id
+                    break
+            if best_id is not None:
+                self._db.execute("UPDATE suites SET uses = uses + 1 WHERE id = ?", (best_id,))
+                self._db.commit()
+            return best
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM suites").fetchone()[0]
+
+
+_indexes: Dict[str, TestSuiteIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_test_index(path: Optional[str] = None) -> TestSuiteIndex:
+    """Return the process-wide index for ``path``."""
+    path = path or Config.TEST_INDEX_PATH
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = TestSuiteIndex(path)
+        return _indexes[path]
@@ -1,7 +1,9 @@
 from dataclasses import dataclass, field
-from typing import List
+from typing import Dict, List, Optional
 from datetime import datetime
 
+from .failures import FailureRecord
+
 @dataclass
 class TestResult:
     passed: bool
@@ -9,4 +11,9 @@ class TestResult:
     failed_tests: List[str]
     execution_time: float
     manim_specific_errors: List[str] = field(default_factory=list)
+    skipped_executions: int = 0  # tests not run because a probe failed first
+    collection_time: float = 0.0  # seconds spent importing and collecting tests
+    test_durations: Dict[str, float] = field(default_factory=dict)  # node id -> seconds
+    failures: List[FailureRecord] = field(default_factory=list)  # digested failures behind ``output``
+    limit_violation: Optional[str] = None  # sandbox limit that stopped the run, e.g. "timeout", "memory"
     timestamp: datetime = field(default_factory=datetime.now)
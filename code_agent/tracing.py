@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from .config import Config
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # epoch seconds
+    duration: float  # seconds
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class JsonlExporter:
+    """Appends spans to a local JSONL file, one span per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[Span], trace_id: str) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock, open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(dict(span.to_dict(), trace_id=trace_id), default=str) + "\n")
+
+
+class OpenTelemetryExporter:
+    """Re-emits spans through the OpenTelemetry API, if it is installed."""
+
+    def __init__(self, service_name: str = "code_agent"):
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError("OpenTelemetry export needs the opentelemetry-api package") from e
+        self._tracer = trace.get_tracer(service_name)
+
+    def export(self, spans: Sequence[Span], trace_id: str) -> None:
+        with self._tracer.start_as_current_span(
+            "solve", start_time=int(min(s.start for s in spans) * 1e9) if spans else None,
+            attributes={"trace_id": trace_id},
+        ):
+            for span in spans:
+                otel_span = self._tracer.start_span(span.name, start_time=int(span.start * 1e9))
+                for key, value in span.attributes.items():
+                    otel_span.set_attribute(key, value if isinstance(value, (str, bool, int, float))
+                                            else json.dumps(value, default=str))
+                otel_span.end(end_time=int((span.start + span.duration) * 1e9))
+
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_read_input_tokens",
+                "cache_creation_input_tokens", "prompt_tokens", "completion_tokens")
+
+
+def add_usage(attributes: Dict[str, Any], usage: Any) -> None:
+    """Add token counts from a ``response.usage`` object or dict to span attributes."""
+    if usage is None:
+        return
+    for name in USAGE_FIELDS:
+        value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        if isinstance(value, int):
+            attributes[name] = attributes.get(name, 0) + value
+
+
+def default_exporters() -> List[Any]:
+    """Exporters enabled through Config."""
+    exporters: List[Any] = []
+    if Config.TRACE_JSONL_PATH:
+        exporters.append(JsonlExporter(Config.TRACE_JSONL_PATH))
+    if Config.TRACE_OTEL:
+        exporters.append(OpenTelemetryExporter())
+    return exporters
+
+
+class Tracer:
+    """Collects timing spans for one solve. Safe to use from several threads."""
+
+    def __init__(self, exporters: Optional[Sequence[Any]] = None):
+        self.exporters = list(default_exporters() if exporters is None else exporters)
+        self.trace_id = os.urandom(8).hex()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Start a new trace, dropping the spans collected so far."""
+        with self._lock:
+            self.trace_id = os.urandom(8).hex()
+            self.spans = []
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """Time a block; the yielded dict can be filled with more attributes."""
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.record(Span(name, start, time.perf_counter() - started, attributes))
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [span.to_dict() for span in self.spans]
+
+    def export(self) -> None:
+        with self._lock:
+            spans = list(self.spans)
+        for exporter in self.exporters:
+            exporter.export(spans, self.trace_id)
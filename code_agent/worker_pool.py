@@ -0,0 +1,459 @@
+import argparse
+import atexit
+import importlib
+import os
+import queue
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from . import failures as digest, sandbox
+from .config import Config
+from .test_result import TestResult
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _rss_mb() -> float:
+    """Resident set size of the current process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is a peak value, but it is the best we have without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PytestWorker:
+    """Handle to one long-lived pytest worker process."""
+
+    def __init__(self, preload: Sequence[str], limits: sandbox.Limits):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [PACKAGE_ROOT, env.get("PYTHONPATH")]))
+        # Resolved here, not in the worker, so runtime Config changes apply
+        self.limits = limits
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "code_agent.worker_pool", "--limits", limits.to_json(), *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            **sandbox.popen_kwargs(),
+        )
+        self._send = Connection(os.dup(self.process.stdin.fileno()), readable=False)
+        self._recv = Connection(os.dup(self.process.stdout.fileno()), writable=False)
+        self.process.stdin.close()
+        self.process.stdout.close()
+        self.jobs = 0
+        self.baseline_rss_mb: Optional[float] = None
+        self.rss_mb: Optional[float] = None
+
+    def _wait_ready(self, timeout: float) -> None:
+        if self.baseline_rss_mb is not None:
+            return
+        if not self._recv.poll(timeout):
+            raise TimeoutError("Worker did not start in time")
+        status, rss = self._recv.recv()
+        self.baseline_rss_mb = self.rss_mb = rss
+
+    def run(self, job: Dict, timeout: float) -> Dict:
+        """Send a job and wait for its result, raising on crash or timeout."""
+        self._wait_ready(Config.TEST_WORKER_STARTUP_TIMEOUT)
+        self._send.send(job)
+        if not self._recv.poll(timeout):
+            raise TimeoutError(f"Tests did not finish within {timeout}s")
+        result = self._recv.recv()
+        self.jobs += 1
+        self.rss_mb = result.pop("rss_mb")
+        return result
+
+    def should_recycle(self, max_jobs: int, max_rss_growth_mb: float) -> bool:
+        if max_jobs and self.jobs >= max_jobs:
+            return True
+        if max_rss_growth_mb and self.rss_mb - self.baseline_rss_mb > max_rss_growth_mb:
+            return True
+        return False
+
+    def close(self) -> None:
+        try:
+            self._send.send(None)
+        except OSError:
+            pass
+        self.kill(grace=1.0)
+
+    def kill(self, grace: float = 0.0) -> None:
+        try:
+            self.process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            pass
+        # Also takes down anything the generated code started
+        sandbox.kill_group(self.process)
+        self._send.close()
+        self._recv.close()
+
+
+class PytestWorkerPool:
+    """Pool of warm worker processes that run generated tests.
+
+    Each worker imports ``preload`` (e.g. manim, numpy) and pytest once and
+    then serves (test_code, implementation) jobs over a pipe, so the agent
+    process never imports generated code and a crashing or hanging scene
+    only costs a worker restart.
+    """
+
+    def __init__(self, preload: Sequence[str] = (), size: Optional[int] = None,
+                 max_jobs: Optional[int] = None, max_rss_growth_mb: Optional[float] = None,
+                 timeout: Optional[float] = None):
+        self.preload = tuple(preload)
+        self.size = size or Config.TEST_WORKERS
+        self.max_jobs = max_jobs if max_jobs is not None else Config.TEST_WORKER_MAX_JOBS
+        self.max_rss_growth_mb = (max_rss_growth_mb if max_rss_growth_mb is not None
+                                  else Config.TEST_WORKER_MAX_RSS_GROWTH_MB)
+        self.timeout = timeout or Config.TEST_TIMEOUT
+        self._idle: "queue.Queue[PytestWorker]" = queue.Queue()
+        self._workers: List[PytestWorker] = []
+        self._lock = threading.Lock()
+        self._names: Dict[Tuple[str, ...], Dict[str, FrozenSet[str]]] = {}
+        # Workers warm up in the background while the first LLM calls run
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> PytestWorker:
+        worker = PytestWorker(self.preload, sandbox.Limits.for_tests())
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _retire(self, worker: PytestWorker, crashed: bool = False) -> None:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if crashed:
+            worker.kill()
+        else:
+            worker.close()
+
+    def run(self, test_code: str, implementation: str, impl_prelude: str = "",
+            test_prelude: str = "", error_keywords: Sequence[str] = (),
+            probes: Sequence[str] = ()) -> TestResult:
+        """Run ``test_code`` against ``implementation`` in a warm worker.
+
+        Tests named in ``probes`` run first and the run stops as soon as
+        one of them fails; the rest of the suite only runs once they pass.
+        """
+        job = {
+            "test_code": test_code,
+            "implementation": implementation,
+            "impl_prelude": impl_prelude,
+            "test_prelude": test_prelude,
+            "error_keywords": list(error_keywords),
+            "probes": list(probes),
+            "case_timeout": Config.TEST_CASE_TIMEOUT,
+        }
+        start_time = time.monotonic()
+        worker = self._idle.get()
+        if worker.limits != sandbox.Limits.for_tests():
+            # The limits changed since this worker started; rlimits are set once per process
+            self._retire(worker)
+            worker = self._spawn()
+        try:
+            result = worker.run(job, self.timeout)
+        except (TimeoutError, EOFError, OSError) as e:
+            # A hung or dead worker is replaced; the failure goes back to the agent loop
+            self._retire(worker, crashed=True)
+            self._idle.put(self._spawn())
+            if isinstance(e, TimeoutError):
+                return self._failure("timeout", str(e), start_time, limit_violation="timeout")
+            violation = sandbox.exit_violation(worker.process.returncode)
+            if violation is not None:
+                return self._failure(violation, f"Test worker stopped by the {violation} limit", start_time,
+                                     limit_violation=violation)
+            return self._failure("worker_crash", f"Test worker exited unexpectedly: {e!r}", start_time)
+        except BaseException:
+            self._idle.put(worker)
+            raise
+
+        # A worker that hit a limit may be left in a bad state (e.g. after MemoryError)
+        if result["limit_violation"] or worker.should_recycle(self.max_jobs, self.max_rss_growth_mb):
+            self._retire(worker)
+            worker = self._spawn()
+        self._idle.put(worker)
+
+        records = digest.merge(result["failures"])
+        return TestResult(
+            passed=result["error"] is None and len(records) == 0,
+            output=result["error"] or digest.render(records),
+            failed_tests=result["failed_tests"] or (["collection"] if result["error"] else []),
+            execution_time=result["execution_time"],
+            manim_specific_errors=result["keyword_errors"],
+            skipped_executions=max(0, result["collected"] - result["executed"]),
+            collection_time=result["collection_time"],
+            test_durations=result["test_durations"],
+            limit_violation=result["limit_violation"],
+            failures=records,
+        )
+
+    def names(self, specs: Sequence[str]) -> Optional[Dict[str, FrozenSet[str]]]:
+        """Names exported by modules the workers import, e.g. ``("manim", "manim:Scene")``.
+
+        Lets the agent process check generated code against manim's
+        namespace without importing manim itself. Answers are cached; None
+        means a worker could not provide them.
+        """
+        key = tuple(specs)
+        if key not in self._names:
+            worker = self._idle.get()
+            try:
+                result = worker.run({"names": list(specs)}, self.timeout)
+            except Exception:
+                self._retire(worker, crashed=True)
+                self._idle.put(self._spawn())
+                return None
+            self._idle.put(worker)
+            self._names[key] = {spec: frozenset(names) for spec, names in result["names"].items()}
+        return self._names[key]
+
+    @staticmethod
+    def _failure(name: str, message: str, start_time: float,
+                 limit_violation: Optional[str] = None) -> TestResult:
+        return TestResult(
+            passed=False,
+            output=message,
+            failed_tests=[name],
+            execution_time=time.monotonic() - start_time,
+            manim_specific_errors=[message],
+            limit_violation=limit_violation,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+
+
+_pools: Dict[Tuple[str, ...], PytestWorkerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(preload: Sequence[str] = ()) -> PytestWorkerPool:
+    """Return the process-wide pool for the given preload modules."""
+    key = tuple(preload)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = PytestWorkerPool(key)
+        return _pools[key]
+
+
+@atexit.register
+def _close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# --- worker process side ---------------------------------------------------
+
+_ADDRESS = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+def _normalize(text: str, workdir: str) -> str:
+    """Strip worker paths and object addresses so equal failures read the same."""
+    text = re.sub(r"[^\s'\"(]*" + re.escape(os.path.basename(workdir)) + re.escape(os.sep), "", text)
+    return _ADDRESS.sub(" at 0x...", text)
+
+
+def _run_job(job: Dict, workdir: str) -> Dict:
+    import pytest
+
+    start_time = time.monotonic()
+    # Fixed names keep failure text identical across workers and runs, so it
+    # does not perturb prompts built from it.
+    impl_module = "generated_impl"
+    impl_path = os.path.join(workdir, f"{impl_module}.py")
+    test_path = os.path.join(workdir, "test_generated.py")
+    with open(impl_path, "w") as f:
+        f.write(job["impl_prelude"] + job["implementation"])
+    with open(test_path, "w") as f:
+        f.write(f"{job['test_prelude']}from {impl_module} import *\n\n{job['test_code']}\n")
+
+    failures: List[digest.FailureRecord] = []
+    failed_tests: List[str] = []
+    keyword_errors = []
+    # Line numbers in failures count from the model's code, not the preludes
+    files = {
+        f"{impl_module}.py": ("implementation", job["impl_prelude"].count("\n")),
+        "test_generated.py": ("tests", job["test_prelude"].count("\n") + 2),
+    }
+
+    def add_failure(name: str, phase: str, longrepr) -> None:
+        error = _normalize(str(longrepr), workdir)
+        record(error)
+        failure = digest.from_report(name.split("::")[-1], phase, longrepr, files,
+                                     lambda text: _normalize(text, workdir))
+        failures.append(failure)
+        failed_tests.append(name)
+        if any(keyword in failure.to_text() for keyword in job["error_keywords"]):
+            keyword_errors.append(f"{failure.exception}: {failure.message}")
+    probes = job["probes"]
+    counts = {"collected": 0, "executed": 0}
+    timings = {"collection_start": start_time, "collection_end": start_time}
+    durations: Dict[str, float] = {}
+    violations: List[str] = []
+
+    def test_timeout(signum, frame):
+        raise sandbox.TestTimeout(f"Test exceeded {job['case_timeout']}s")
+
+    def record(error: str) -> None:
+        violation = sandbox.classify(error)
+        if violation is not None:
+            violations.append(violation)
+
+    class WorkerPlugin:
+        def pytest_collection(self, session):
+            timings["collection_start"] = time.monotonic()
+
+        def pytest_collection_finish(self, session):
+            timings["collection_end"] = time.monotonic()
+
+        def pytest_collection_modifyitems(self, session, config, items):
+            # Previously failing tests go first, in the order given
+            order = {name: i for i, name in enumerate(probes)}
+            items.sort(key=lambda item: order.get(item.name, len(order)))
+            counts["collected"] = len(items)
+
+        def pytest_runtest_logfinish(self, nodeid, location):
+            counts["executed"] += 1
+
+        @pytest.hookimpl(hookwrapper=True)
+        def pytest_runtest_protocol(self, item, nextitem):
+            # Interrupts Python-level loops; the pool's TEST_TIMEOUT covers the rest
+            previous = signal.signal(signal.SIGALRM, test_timeout)
+            signal.setitimer(signal.ITIMER_REAL, job["case_timeout"])
+            try:
+                yield
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, previous)
+
+        @pytest.hookimpl(hookwrapper=True)
+        def pytest_runtest_makereport(self, item, call):
+            outcome = yield
+            report = outcome.get_result()
+            if report.failed and item.name in probes:
+                item.session.shouldstop = f"probe {item.name} failed"
+
+        def pytest_runtest_logreport(self, report):
+            # setup, call and teardown together
+            durations[report.nodeid] = durations.get(report.nodeid, 0.0) + report.duration
+            if report.failed:
+                add_failure(report.nodeid, report.when, report.longrepr)
+
+        def pytest_collectreport(self, report):
+            if report.failed:
+                add_failure(report.nodeid or "collection", "collect", report.longrepr)
+
+    error = None
+    try:
+        exit_code = pytest.main(["-v", "-p", "no:cacheprovider", "--rootdir", workdir, test_path],
+                                plugins=[WorkerPlugin()])
+        if exit_code not in (pytest.ExitCode.OK, pytest.ExitCode.TESTS_FAILED) and not failures:
+            error = f"pytest exited with {exit_code!r}"
+    except BaseException as e:  # generated code may raise SystemExit and friends
+        error = f"pytest crashed: {e!r}"
+        record(error)
+    finally:
+        # Forget everything imported from the job so the next one starts clean
+        for name, module in list(sys.modules.items()):
+            if (getattr(module, "__file__", None) or "").startswith(workdir):
+                del sys.modules[name]
+        importlib.invalidate_caches()
+        for path in (impl_path, test_path):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    return {
+        "failures": failures,
+        "failed_tests": failed_tests,
+        "keyword_errors": list(dict.fromkeys(keyword_errors)),
+        "error": error,
+        "collected": counts["collected"],
+        "executed": counts["executed"],
+        "execution_time": time.monotonic() - start_time,
+        "collection_time": timings["collection_end"] - timings["collection_start"],
+        "test_durations": durations,
+        "limit_violation": violations[0] if violations else None,
+        "rss_mb": _rss_mb(),
+    }
+
+
+def _names(specs: Sequence[str]) -> Dict[str, List[str]]:
+    """Public names of modules ("manim") or their attributes ("manim:Scene")."""
+    names = {}
+    for spec in specs:
+        module_name, _, attribute = spec.partition(":")
+        try:
+            target = importlib.import_module(module_name)
+            if attribute:
+                target = getattr(target, attribute)
+        except (ImportError, AttributeError):
+            continue  # left out of the answer
+        names[spec] = sorted(getattr(target, "__all__", None) or dir(target))
+    return {"names": names}
+
+
+def _worker_main(preload: Sequence[str], limits: sandbox.Limits) -> None:
+    # The pipe on stdout carries results; everything printed by pytest or the
+    # generated code goes to stderr instead.
+    results = Connection(os.dup(1), readable=False)
+    jobs = Connection(os.dup(0), writable=False)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    sys.dont_write_bytecode = True
+
+    import pytest  # noqa: F401
+    for name in preload:
+        # "module:function" entries call a setup function after importing
+        module_name, _, function = name.partition(":")
+        module = importlib.import_module(module_name)
+        if function:
+            getattr(module, function)()
+
+    workdir = tempfile.mkdtemp(prefix="code_agent_worker_")
+    sys.path.insert(0, workdir)
+    sandbox.apply(limits)
+    results.send(("ready", _rss_mb()))
+
+    while True:
+        try:
+            job = jobs.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        if "names" in job:
+            results.send(dict(_names(job["names"]), rss_mb=_rss_mb()))
+        else:
+            sandbox.set_cpu_budget(limits)
+            results.send(_run_job(job, workdir))
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pytest worker serving jobs over stdin/stdout")
+    parser.add_argument("--limits", required=True, help="sandbox.Limits as JSON, resolved by the pool")
+    parser.add_argument("preload", nargs="*")
+    args = parser.parse_args()
+    _worker_main(args.preload, sandbox.Limits.from_json(args.limits))
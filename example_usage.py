@@ -1,4 +1,3 @@
-from manim import *
 from code_agent.manim_agent import ManimAgent
 
 agent = ManimAgent()
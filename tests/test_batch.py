@@ -0,0 +1,88 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from code_agent.batch import RateLimitedClient, RateLimiter, solve_many
+
+WINDOW = 0.3
+
+
+def timed(fn, *args):
+    start = time.monotonic()
+    result = fn(*args)
+    return result, time.monotonic() - start
+
+
+def test_requests_per_minute():
+    limiter = RateLimiter(requests_per_minute=2, window=WINDOW)
+    assert timed(limiter.acquire)[1] < 0.05
+    assert timed(limiter.acquire)[1] < 0.05
+    # The third request waits for the first to leave the window
+    assert timed(limiter.acquire)[1] >= WINDOW * 0.9
+
+
+def test_tokens_per_minute():
+    limiter = RateLimiter(tokens_per_minute=100, window=WINDOW)
+    limiter.acquire(60)
+    assert timed(limiter.acquire, 40)[1] < 0.05
+    assert timed(limiter.acquire, 1)[1] >= WINDOW * 0.9
+
+
+def test_a_request_over_the_whole_budget_still_goes_alone():
+    limiter = RateLimiter(tokens_per_minute=100, window=WINDOW)
+    assert timed(limiter.acquire, 500)[1] < 0.05
+    assert timed(limiter.acquire, 1)[1] >= WINDOW * 0.9
+
+
+def test_settling_below_the_estimate_wakes_waiters():
+    limiter = RateLimiter(tokens_per_minute=100, window=10.0)
+    event = limiter.acquire(100)
+    acquired = threading.Event()
+    threading.Thread(target=lambda: (limiter.acquire(50), acquired.set()), daemon=True).start()
+    assert not acquired.wait(0.1)
+    limiter.settle(event, 20)
+    assert acquired.wait(1.0)
+
+
+class Messages:
+    def __init__(self):
+        self.requests = []
+
+    def create(self, **request):
+        self.requests.append(request)
+        return SimpleNamespace(usage=SimpleNamespace(input_tokens=7, output_tokens=3))
+
+
+def test_client_settles_the_reported_usage():
+    limiter = RateLimiter(tokens_per_minute=10_000, window=10.0)
+    client = RateLimitedClient(SimpleNamespace(messages=Messages()), limiter)
+    client.messages.create(model="m", system="s", messages=[{"role": "user", "content": "hi"}], max_tokens=4000)
+    assert client.inner.messages.requests[0]["max_tokens"] == 4000
+    # The 4000-token output cap was only an estimate
+    assert [event[1] for event in limiter._events] == [10]
+
+
+def test_resumed_batch_retries_failures_without_the_cache(tmp_path):
+    calls = {}
+
+    class Agent:
+        def __init__(self, client, settings, **kwargs):
+            self.kwargs = kwargs
+
+        def solve(self, prompt):
+            calls[prompt] = self.kwargs
+            if prompt == "fails":
+                raise RuntimeError("no luck")
+            return {"iterations": 1}
+
+    def run(prompts):
+        return solve_many(prompts, str(tmp_path), client=SimpleNamespace(messages=Messages()), agent_factory=Agent)
+
+    first = run({"a": "passes", "b": "fails"})
+    assert [record["status"] for record in first] == ["passed", "failed"]
+    assert calls == {"passes": {}, "fails": {}}
+
+    calls.clear()
+    second = run({"a": "passes", "b": "fails", "c": "new"})
+    assert [record["id"] for record in second] == ["b", "c"]
+    assert calls == {"fails": {"use_cache": False}, "new": {}}
@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+import pytest
+
+from code_agent.agent import CodeAgent
+from code_agent.config import Config
+from code_agent.engine import get_engine
+from code_agent.exceptions import DeadlineExceeded
+from code_agent.providers import (
+    AnthropicProvider, LLMRequest, LLMResponse, OpenAIProvider, Provider, StubProvider,
+)
+
+TESTS = "```python\ndef test_add():\n    assert add(1, 2) == 3\n```"
+WRONG = "```python\ndef add(a, b):\n    return a - b\n```"
+RIGHT = "It subtracted instead of adding.\n```python\ndef add(a, b):\n    return a + b\n```"
+
+
+def respond(request):
+    if request.content.startswith("Write pytest"):
+        return TESTS
+    # The first attempt is wrong; once there is history, fix it
+    return RIGHT if "Attempt 1" in request.content else WRONG
+
+
+@pytest.fixture(autouse=True)
+def sequential(monkeypatch):
+    monkeypatch.setattr(Config, "NUM_CANDIDATES", 1)
+    monkeypatch.setattr(Config, "SOLVE_DEADLINE", None)
+
+
+def test_solve_iterates_until_the_tests_pass():
+    provider = StubProvider(respond)
+    result = CodeAgent(provider=provider, use_cache=False).solve("add two numbers")
+    assert result["iterations"] == 2
+    assert "a + b" in result["implementation"]
+    llm_spans = [span for span in result["spans"] if span["name"].startswith("llm.")]
+    assert [span["name"] for span in llm_spans] == ["llm.test_generation", "llm.implementation",
+                                                    "llm.implementation"]
+    assert all(span["attributes"]["provider"] == "stub" for span in llm_spans)
+
+
+def test_asolve_runs_candidates_concurrently():
+    provider = StubProvider([TESTS, WRONG, RIGHT, WRONG])
+
+    async def main():
+        return await CodeAgent(provider=provider, use_cache=False).asolve("add", num_candidates=3)
+
+    result = asyncio.run(main())
+    assert result["iterations"] == 1
+    assert result["candidates"] == 3
+
+
+def test_deadline_abandons_slow_candidates():
+    def slow(request):
+        if request.content.startswith("Write pytest"):
+            return TESTS
+        time.sleep(1.0)
+        return WRONG
+
+    agent = CodeAgent(provider=StubProvider(slow), use_cache=False)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        agent.solve("add", deadline=0.3)
+    assert time.monotonic() - start < 1.0
+
+
+class Flaky(Provider):
+    name = "flaky"
+
+    def __init__(self, errors, **kwargs):
+        super().__init__(**kwargs)
+        self.errors = list(errors)
+        self.calls = 0
+
+    @property
+    def default_model(self):
+        return "flaky"
+
+    def native(self, request):
+        return {"content": request.content}
+
+    async def _complete(self, native):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return LLMResponse("ok")
+
+
+def status_error(status):
+    error = Exception(f"HTTP {status}")
+    error.status_code = status
+    return error
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_RETRY_BASE_DELAY", 0.001)
+    provider = Flaky([status_error(529), ConnectionError("reset")])
+    response = get_engine().run(provider.complete(LLMRequest("m", "system", "content")))
+    assert response.text == "ok"
+    assert provider.calls == 3
+
+
+def test_client_errors_are_not_retried():
+    provider = Flaky([status_error(400)])
+    with pytest.raises(Exception, match="HTTP 400"):
+        get_engine().run(provider.complete(LLMRequest("m", "system", "content")))
+    assert provider.calls == 1
+
+
+def test_retries_give_up(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_RETRY_BASE_DELAY", 0.001)
+    provider = Flaky([status_error(429)] * 3, max_retries=2)
+    with pytest.raises(Exception, match="HTTP 429"):
+        get_engine().run(provider.complete(LLMRequest("m", "system", "content")))
+    assert provider.calls == 3
+
+
+def test_anthropic_request_marks_the_cached_prefix(monkeypatch):
+    monkeypatch.setattr(Config, "PROMPT_CACHING", True)
+    native = AnthropicProvider(client=object()).native(
+        LLMRequest("model", "system", "content", cached_prefix="prefix", max_tokens=100, temperature=0.5)
+    )
+    assert native["system"] == [{"type": "text", "text": "system", "cache_control": {"type": "ephemeral"}}]
+    assert native["messages"] == [{"role": "user", "content": [
+        {"type": "text", "text": "prefix", "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "content"},
+    ]}]
+    assert (native["max_tokens"], native["temperature"]) == (100, 0.5)
+
+
+def test_anthropic_request_without_prompt_caching(monkeypatch):
+    monkeypatch.setattr(Config, "PROMPT_CACHING", False)
+    native = AnthropicProvider(client=object()).native(LLMRequest("model", "system", "content", "prefix"))
+    assert native["system"] == "system"
+    assert native["messages"] == [{"role": "user", "content": "prefix\n\ncontent"}]
+    assert native["max_tokens"] == Config.LLM_MAX_TOKENS
+    assert "temperature" not in native
+
+
+def test_openai_request():
+    native = OpenAIProvider(client=object()).native(LLMRequest("gpt", "system", "content", "prefix"))
+    assert native == {"model": "gpt", "messages": [
+        {"role": "system", "content": "system"},
+        {"role": "user", "content": "prefix\n\ncontent"},
+    ]}
@@ -0,0 +1,67 @@
+from code_agent import failures
+from code_agent.failures import FailureRecord
+from code_agent.worker_pool import get_pool
+
+IMPLEMENTATION = """def add(a, b):
+    return a - b
+
+
+def parse(text):
+    return int(text)
+"""
+
+TESTS = """def test_add():
+    assert add(1, 2) == 3
+
+
+def test_parse():
+    assert parse("x") == 0
+
+
+def test_parse_again():
+    assert parse("x") == 0
+"""
+
+
+def record(test, message="boom", location="implementation line 2"):
+    return FailureRecord([test], "call", "ValueError", message, location)
+
+
+def test_failures_point_at_the_models_code():
+    result = get_pool().run(TESTS, IMPLEMENTATION, impl_prelude="import os\n\n")
+    by_test = {tuple(r.tests): r for r in result.failures}
+
+    add = by_test[("test_add",)]
+    assert add.exception == "AssertionError"
+    assert add.location == "tests line 2"
+    assert (add.expected, add.actual) == ("3", "-1")
+
+    # The same error from two tests is reported once
+    parse = by_test[("test_parse", "test_parse_again")]
+    assert parse.exception == "ValueError"
+    assert parse.location == "implementation line 6"
+    assert parse.code == "return int(text)"
+    assert "Traceback" not in result.output
+
+
+def test_merge_keeps_distinct_failures_apart():
+    merged = failures.merge([record("a"), record("b"), record("c", message="other"), record("a")])
+    assert [r.tests for r in merged] == [["a", "b"], ["c"]]
+
+
+def test_merge_does_not_modify_its_input():
+    records = [record("a"), record("b")]
+    failures.merge(records)
+    assert records[0].tests == ["a"]
+
+
+def test_render_caps_the_text():
+    records = [record(f"test_{i}", message="x" * 50) for i in range(20)]
+    text = failures.render(records, max_chars=300)
+    assert len(text) < 400
+    assert text.endswith("more failures omitted")
+    assert text.startswith("test_0 [call] ValueError: ")
+
+
+def test_render_truncates_a_single_long_record():
+    assert len(failures.render([record("a", message="x" * 1000)], max_chars=100)) == 100
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from code_agent.background_render import BackgroundRender
+from code_agent.config import Config
+from code_agent.exceptions import QueueFull, RenderCancelled
+from code_agent.jobs import JobQueue
+
+lock = threading.Lock()
+
+
+def blocking_render(release, running, peak):
+    def render(cancel):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        try:
+            while not release.wait(0.01):
+                if cancel.is_set():
+                    raise RenderCancelled("cancelled")
+            return "video.mp4"
+        finally:
+            with lock:
+                running.pop()
+    return render
+
+
+def test_background_renders_share_a_bounded_pool():
+    release, running, peak = threading.Event(), [], []
+    renders = [BackgroundRender(blocking_render(release, running, peak), "high_quality") for _ in range(5)]
+    time.sleep(0.2)
+    assert len(running) == Config.UPGRADE_WORKERS
+    release.set()
+    assert [render.wait(2) for render in renders] == ["video.mp4"] * 5
+    assert max(peak) == Config.UPGRADE_WORKERS
+
+
+def test_a_render_cancelled_while_queued_never_starts():
+    release, running, peak = threading.Event(), [], []
+    busy = [BackgroundRender(blocking_render(release, running, peak), "high_quality")
+            for _ in range(Config.UPGRADE_WORKERS)]
+    started = []
+    queued = BackgroundRender(lambda cancel: started.append(1), "high_quality")
+    queued.cancel()
+    release.set()
+    for render in busy + [queued]:
+        render.wait(2)
+    assert queued.done and queued.video_path is None and not started
+
+
+class Agent:
+    def __init__(self, release, **kwargs):
+        self.release = release
+        self.kwargs = kwargs
+
+    def solve(self, prompt):
+        upgrade = BackgroundRender(lambda cancel: self.release.wait(2) and "full.mp4", "high_quality")
+        return {"video_path": "preview.mp4", "upgrade": upgrade, "kwargs": self.kwargs}
+
+
+def wait_finished(job):
+    deadline = time.monotonic() + 2
+    while not job.is_finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.is_finished
+
+
+def test_pending_upgrades_count_toward_admission():
+    release = threading.Event()
+    queue = JobQueue(workers=1, max_queued=0, agent_factory=lambda **kwargs: Agent(release, **kwargs))
+    try:
+        job = queue.submit("prompt")
+        wait_finished(job)
+        with pytest.raises(QueueFull):
+            queue.submit("another prompt")
+        release.set()
+        assert job.upgrade.wait(2) == "full.mp4"
+        wait_finished(queue.submit("another prompt", use_cache=False))
+    finally:
+        release.set()
+        queue.shutdown()
@@ -0,0 +1,85 @@
+import os
+import urllib.error
+import urllib.request
+
+import pytest
+
+from code_agent.media_server import MediaServer, cleanup_media, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+    ("bytes=-", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=20-10", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "media").mkdir()
+    (tmp_path / "media" / "scene video.mp4").write_bytes(bytes(range(256)) * 4)
+    (tmp_path / "secret.txt").write_text("secret")
+    media = MediaServer([str(tmp_path / "media")], host="127.0.0.1", port=0, base_url="", retention=0).start()
+    yield media
+    media.stop()
+
+
+def fetch(url, **headers):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, b""
+
+
+def test_serves_byte_ranges(server, tmp_path):
+    url = server.url_for(str(tmp_path / "media" / "scene video.mp4"))
+    status, headers, body = fetch(url)
+    assert (status, len(body), headers["Content-Type"]) == (200, 1024, "video/mp4")
+
+    status, headers, body = fetch(url, Range="bytes=256-259")
+    assert (status, body) == (206, bytes([0, 1, 2, 3]))
+    assert headers["Content-Range"] == "bytes 256-259/1024"
+
+    status, headers, _ = fetch(url, Range="bytes=2000-")
+    assert (status, headers["Content-Range"]) == (416, "bytes */1024")
+
+
+def test_download_is_an_attachment(server, tmp_path):
+    url = server.url_for(str(tmp_path / "media" / "scene video.mp4"))
+    _, headers, _ = fetch(f"{url}?download=1")
+    assert headers["Content-Disposition"] == 'attachment; filename="scene video.mp4"'
+
+
+def test_refuses_paths_outside_the_roots(server, tmp_path):
+    assert server.url_for(str(tmp_path / "secret.txt")) is None
+    assert server.resolve("/0/../secret.txt") is None
+    assert fetch(f"{server.base_url}/0/..%2Fsecret.txt")[0] == 404
+    assert fetch(f"{server.base_url}/1/secret.txt")[0] == 404
+
+
+def test_cleanup_media(tmp_path):
+    old = tmp_path / "videos" / "old.mp4"
+    new = tmp_path / "new.mp4"
+    old.parent.mkdir()
+    old.write_bytes(b"")
+    new.write_bytes(b"")
+    os.utime(old, (1000, 1000))
+    os.utime(new, (5000, 5000))
+    assert cleanup_media(str(tmp_path), max_age=100, now=2000) == 1
+    assert not old.parent.exists()
+    assert new.exists()
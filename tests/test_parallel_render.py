@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+from code_agent import parallel_render
+from code_agent.exceptions import RenderCancelled
+
+
+@pytest.fixture
+def scene(tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel_render.shutil, "which", lambda name: "/usr/bin/ffmpeg")
+    path = tmp_path / "scene.py"
+    path.write_text("raise RuntimeError('broken scene')\n")
+    return str(path)
+
+
+def test_falls_back_to_serial_when_counting_fails(scene, tmp_path):
+    # The count worker dies on the broken module (or a missing manim)
+    assert parallel_render.render_parallel(scene, "Demo", {"quality": "low_quality", "format": "mp4"},
+                                           str(tmp_path / "out.mp4"), workers=2) is None
+
+
+def test_cancelling_while_counting_still_cancels(scene, tmp_path):
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(RenderCancelled):
+        parallel_render.render_parallel(scene, "Demo", {"quality": "low_quality", "format": "mp4"},
+                                        str(tmp_path / "out.mp4"), workers=2, cancel=cancel)
+
+
+@pytest.mark.parametrize("settings, workers", [
+    ({"format": "gif"}, 4),
+    ({"format": "mp4"}, 1),
+])
+def test_ruled_out_without_counting(tmp_path, settings, workers):
+    assert parallel_render.render_parallel("missing.py", "Demo", settings, str(tmp_path / "out"),
+                                           workers=workers) is None
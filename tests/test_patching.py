@@ -0,0 +1,73 @@
+import pytest
+
+from code_agent.exceptions import PatchError
+from code_agent.patching import Edit, apply_edit, apply_edits, parse_edits
+
+CODE = """class MyScene(Scene):
+    def construct(self):
+        self.circle = Circle(radius=1)
+        self.square = Square(side_length=1)
+        self.play(Create(self.circle))
+        self.wait()
+"""
+
+
+def test_exact_match():
+    patched = apply_edits(CODE, [Edit("        self.circle = Circle(radius=1)",
+                                      "        self.circle = Circle(radius=2)")])
+    assert "Circle(radius=2)" in patched
+    assert "Square(side_length=1)" in patched
+
+
+def test_wrong_indentation_is_reindented():
+    edit = Edit("self.circle = Circle(radius=1)\nself.square = Square(side_length=1)",
+                "self.circle = Circle(radius=2)\nif True:\n    self.square = Square(side_length=2)")
+    patched = apply_edits(CODE, [edit])
+    assert "        self.circle = Circle(radius=2)\n        if True:\n            self.square" in patched
+
+
+def test_partial_lines_do_not_match():
+    # "radius=1" occurs once as a substring, but is not a whole line
+    with pytest.raises(PatchError, match="not found"):
+        apply_edit(CODE, Edit("radius=1", "radius=2"))
+
+
+def test_ambiguous_match():
+    code = "a = 1\nb = 2\na = 1\n"
+    with pytest.raises(PatchError, match="matches 2 places"):
+        apply_edit(code, Edit("a = 1", "a = 3"))
+
+
+def test_indentation_breaks_a_tie():
+    code = "def f():\n    x = 1\nx = 1\n"
+    assert apply_edit(code, Edit("    x = 1", "    x = 2")) == "def f():\n    x = 2\nx = 1\n"
+
+
+def test_not_found():
+    with pytest.raises(PatchError, match="not found"):
+        apply_edit(CODE, Edit("        self.triangle = Triangle()", ""))
+
+
+def test_result_must_compile():
+    with pytest.raises(PatchError, match="does not compile"):
+        apply_edits(CODE, [Edit("        self.wait()", "        self.wait(")])
+
+
+def test_parse_edits_keeps_the_analysis_without_fences():
+    response = """The radius is wrong.
+```python
+<<<<<<< SEARCH
+        self.circle = Circle(radius=1)
+=======
+        self.circle = Circle(radius=2)
+>>>>>>> REPLACE
+```"""
+    analysis, edits = parse_edits(response)
+    assert analysis == "The radius is wrong."
+    assert edits == [Edit("        self.circle = Circle(radius=1)", "        self.circle = Circle(radius=2)")]
+
+
+def test_parse_edits_without_analysis():
+    analysis, edits = parse_edits("```python\n<<<<<<< SEARCH\na\n=======\nb\n>>>>>>> REPLACE\n```")
+    assert analysis == ""
+    assert edits == [Edit("a", "b")]
@@ -0,0 +1,117 @@
+import pytest
+
+from code_agent import preflight
+
+MANIM_NAMES = {"Scene", "Circle", "MathTex", "Tex", "Create", "BLUE", "UP"}
+
+SCENE = """from manim import *
+
+class Demo(Scene):
+    def construct(self):
+        self.circle = Circle(color=BLUE)
+        self.play(Create(self.circle))
+"""
+
+
+def checks(findings):
+    return [finding.check for finding in findings]
+
+
+def test_clean_scene_has_no_findings():
+    assert preflight.analyze(SCENE, known_names=MANIM_NAMES) == []
+
+
+def test_syntax_error():
+    findings = preflight.analyze("class Demo(Scene):\n    def construct(self)\n")
+    assert checks(findings) == ["syntax"]
+    assert findings[0].line == 2
+
+
+def test_missing_scene_class():
+    assert checks(preflight.analyze("class Demo:\n    pass\n")) == ["scene_class"]
+    assert preflight.find_scene_class(SCENE) == "Demo"
+    assert preflight.find_scene_class("class Demo(ThreeDScene): pass") == "Demo"
+
+
+def test_undefined_name():
+    source = SCENE + "        self.play(FadeIn(self.circle))\n"
+    findings = preflight.analyze(source, known_names=MANIM_NAMES)
+    assert checks(findings) == ["undefined_name"]
+    assert "'FadeIn'" in findings[0].message and findings[0].line == 7
+
+
+def test_names_are_not_checked_without_the_manim_namespace():
+    assert preflight.analyze(SCENE + "        FadeIn\n") == []
+
+
+@pytest.mark.parametrize("line", [
+    "import math\n        math.sqrt(2)",
+    "for i in range(3):\n            print(i)",
+    "f = lambda x: x\n        np.sin(f(1))",
+])
+def test_defined_names(line):
+    assert preflight.analyze(SCENE + f"        {line}\n", known_names=MANIM_NAMES) == []
+
+
+def test_star_imports_outside_manim_skip_the_name_check():
+    source = "from numpy import *\n" + SCENE + "        sqrt(2)\n"
+    assert preflight.analyze(source, known_names=MANIM_NAMES) == []
+    # A manim star import still leaves the check on
+    source = "from manim.utils import *\n" + SCENE + "        sqrt(2)\n"
+    assert checks(preflight.analyze(source, known_names=MANIM_NAMES)) == ["undefined_name"]
+
+
+TESTS = """def test_circle():
+    scene = Demo()
+    scene.construct()
+    assert scene.circle.radius == 1
+    assert scene.square.side_length == 2
+    assert scene.camera is not None
+"""
+
+
+def test_missing_attribute():
+    findings = preflight.analyze(SCENE, TESTS)
+    assert checks(findings) == ["missing_attribute"]
+    assert "'Demo.square'" in findings[0].message and findings[0].line == 5
+
+
+def test_attributes_from_helper_bases_and_extras():
+    source = SCENE.replace("class Demo(Scene):", "class Base(Scene):\n    square = None\n\nclass Demo(Base):")
+    assert preflight.analyze(source, TESTS) == []
+    assert preflight.analyze(SCENE, TESTS, scene_extras=["square"]) == []
+
+
+def test_dynamic_attributes_are_not_checked():
+    source = SCENE + "        setattr(self, 'square', None)\n"
+    assert preflight.analyze(source, TESTS) == []
+
+
+def test_broken_tests_are_ignored():
+    assert preflight.analyze(SCENE, "def test_(:\n") == []
+
+
+@pytest.mark.parametrize("argument, escape", [
+    ('"\\frac{1}{2}"', "\\f"),
+    ('"\\theta"', "\\t"),
+    ('"x" + "\\nabla f"', "\\n"),
+    ('f"\\beta_{n}"', "\\b"),
+])
+def test_latex_escape_sequences(argument, escape):
+    findings = preflight.analyze(SCENE + f"        MathTex({argument})\n")
+    assert checks(findings) == ["latex_not_raw"]
+    assert f"'{escape}'" in findings[0].message
+
+
+@pytest.mark.parametrize("argument", [
+    'r"\\frac{1}{2}"',
+    'R"\\theta"',
+    'rf"\\frac{{{1}}}{{2}}"',
+    '"\\\\frac{1}{2}"',  # escaped backslash: the value is \frac
+    '"\\\\\\\\"',  # a LaTeX line break
+    '"\\sqrt{2}"',  # \s is not a Python escape
+    '"x^2"',
+])
+@pytest.mark.filterwarnings("ignore:invalid escape sequence")
+def test_latex_strings_that_reach_latex_intact(argument):
+    assert preflight.analyze(SCENE + f"        Tex({argument})\n") == []
@@ -0,0 +1,38 @@
+import signal
+
+import pytest
+
+from code_agent import sandbox
+from code_agent.config import Config
+
+
+@pytest.mark.parametrize("text, limit", [
+    ("TestTimeout: Test exceeded 30s", "test_timeout"),
+    ("CpuTimeExceeded: CPU time limit of 60s exceeded", "cpu"),
+    ("MemoryError", "memory"),
+    ("OSError: [Errno 27] File too large", "output"),
+    ("OSError: [Errno 24] Too many open files: 'x.txt'", "open_files"),
+    ("AssertionError: assert 1 == 2", None),
+])
+def test_classify(text, limit):
+    assert sandbox.classify(text) == limit
+
+
+def test_exit_violation():
+    assert sandbox.exit_violation(-signal.SIGXCPU) == "cpu"
+    assert sandbox.exit_violation(-signal.SIGXFSZ) == "output"
+    assert sandbox.exit_violation(-signal.SIGKILL) is None
+    assert sandbox.exit_violation(1) is None
+
+
+def test_limits_are_resolved_from_the_current_config(monkeypatch):
+    monkeypatch.setattr(Config, "TEST_MEMORY_MB", 123)
+    monkeypatch.setattr(Config, "SANDBOX_LIMITS", False)
+    limits = sandbox.Limits.for_tests()
+    assert limits.memory_mb == 123
+    assert not limits.enabled
+
+
+def test_limits_survive_the_trip_to_a_worker():
+    limits = sandbox.Limits.for_renders()
+    assert sandbox.Limits.from_json(limits.to_json()) == limits
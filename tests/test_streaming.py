@@ -0,0 +1,111 @@
+import pytest
+
+from code_agent.base_agent import BaseAgent
+from code_agent.config import Config
+from code_agent.exceptions import StreamAborted
+from code_agent.providers import StubProvider
+from code_agent.streaming import CodeStreamMonitor
+
+DECORATED = '''Here are the tests:
+```python
+import pytest
+from dataclasses import dataclass
+
+
+@pytest.fixture
+def scene():
+    return MyScene()
+
+
+@pytest.mark.parametrize(
+    "radius",
+    [1, 2],
+)
+def test_radius(scene, radius):
+    assert scene.circle.radius > 0
+
+
+@dataclass
+class Point:
+    x: int
+
+
+def test_point():
+    assert Point(1).x == 1
+```
+Some trailing text.'''
+
+MULTILINE_CALL = '''```python
+result = compute(
+    1,
+    2,
+)
+values = [
+    1, 2,
+]
+print(result, values)
+```'''
+
+BROKEN = '''```python
+def first():
+    return 1
+
+def second()
+    return 2
+
+def third():
+    return 3
+```'''
+
+
+def feed(response, chunk_size):
+    monitor = CodeStreamMonitor()
+    for start in range(0, len(response), chunk_size):
+        if monitor.feed(response[start:start + chunk_size]):
+            break
+    return monitor
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 65))
+def test_decorators_are_not_broken_code(chunk_size):
+    monitor = feed(DECORATED, chunk_size)
+    assert monitor.complete
+    assert monitor.text == DECORATED[:DECORATED.index("\n```\n") + 4]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64])
+def test_multiline_calls_are_not_broken_code(chunk_size):
+    assert feed(MULTILINE_CALL, chunk_size).complete
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 16])
+def test_syntax_error_aborts_before_the_block_ends(chunk_size):
+    with pytest.raises(StreamAborted) as info:
+        feed(BROKEN, chunk_size)
+    assert "expected ':'" in str(info.value)
+    assert "return 3" not in info.value.text
+
+
+def test_text_before_the_fence_is_kept():
+    monitor = CodeStreamMonitor()
+    assert not monitor.feed("Analysis first.\n```python\nx = 1\n")
+    assert monitor.feed("```\nignored")
+    assert monitor.text == "Analysis first.\n```python\nx = 1\n```"
+
+
+class AbortingProvider(StubProvider):
+    """Streams that always break, with a working non-streamed response."""
+
+    supports_streaming = True
+
+    async def _stream_code(self, native, usage):
+        raise StreamAborted("Broken code in streamed response", "```python\ndef f(")
+
+
+def test_aborted_streams_fall_back_to_a_complete_response(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_STREAMING", True)
+    agent = BaseAgent(AbortingProvider(["```python\ndef f():\n    return 1\n```"]), use_cache=False)
+    text = agent._create_message("system", "content", stream_code=True, phase="test")
+    assert text == "```python\ndef f():\n    return 1\n```"
+    span = agent.tracer.spans[-1]
+    assert span.attributes["aborted_streams"] == Config.STREAM_RETRIES + 1
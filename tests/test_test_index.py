@@ -0,0 +1,49 @@
+import pytest
+
+from code_agent import test_index
+from code_agent.test_index import same_words
+
+TESTS = "def test_scene():\n    pass\n"
+
+
+@pytest.fixture
+def index(tmp_path):
+    return test_index.TestSuiteIndex(str(tmp_path / "index.sqlite3"))
+
+
+@pytest.mark.parametrize("stored, prompt", [
+    ("Animate the addition of two fractions step by step",
+     "Animate the multiplication of two fractions step by step"),
+    ("Draw a blue circle and move it to the right edge of the screen",
+     "Draw a red circle and move it to the right edge of the screen"),
+    ("Show a 2x2 matrix multiplication with highlighted rows",
+     "Show a 3x3 matrix multiplication with highlighted rows"),
+    ("Rotate the square to the left", "Rotate the square to the right"),
+    ("Show the derivative of sin(x)", "Show the derivative of sin(x) and cos(x)"),
+])
+def test_different_prompts_do_not_reuse_tests(index, stored, prompt):
+    index.add(stored, TESTS)
+    assert index.find(prompt) is None
+
+
+@pytest.mark.parametrize("prompt", [
+    "Animate the addition of two fractions step by step",
+    "animate the addition of two fractions, step by step!",
+    "Animate the additon of two fractions step by step",
+    "Animate the addition of two fracitons step by step",
+])
+def test_near_identical_prompts_reuse_tests(index, prompt):
+    index.add("Animate the addition of two fractions step by step", TESTS)
+    match = index.find(prompt)
+    assert match is not None and match.test_code == TESTS
+
+
+@pytest.mark.parametrize("first, second, same", [
+    ("circle", "circles", True),
+    ("matrix", "matirx", True),
+    ("right", "eight", False),  # short words are not typo-tolerant
+    ("length", "lengths2", False),
+    ("fractions", "functions", False),
+])
+def test_same_words(first, second, same):
+    assert same_words(first, second) is same